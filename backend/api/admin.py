@@ -4,6 +4,12 @@ from . import models
 
 
 class UserAdmin(admin.ModelAdmin):
+    list_display = (
+        'username',
+        'email',
+        'recipes_count',
+        'followers_count',
+    )
     list_filter = (
         'email',
         'username',
@@ -14,6 +20,7 @@ class RecipeAdmin(admin.ModelAdmin):
     list_display = (
         'name',
         'author',
+        'favorites_count',
     )
     list_filter = (
         'author',
@@ -40,3 +47,4 @@ admin.site.register(models.IngredientRecipe)
 admin.site.register(models.Follow)
 admin.site.register(models.ShoppingCart)
 admin.site.register(models.Favorited)
+admin.site.register(models.ShoppingListItem)
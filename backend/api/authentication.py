@@ -0,0 +1,119 @@
+import time
+from collections import Counter, OrderedDict
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import BaseDatabaseCache
+from django.core.checks import Error, Tags, register
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+
+from .models import User
+
+stats = Counter()
+
+LOCAL_TOKEN_CACHE = 'local'
+USER_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name',
+               'is_active', 'is_staff', 'is_superuser')
+
+
+def token_key(key):
+    return f'auth:token:{key}'
+
+
+class LocalTokenCache:
+
+    def __init__(self):
+        self.lock = Lock()
+        self.items = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.items.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.items[key]
+                return None
+            self.items.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, timeout):
+        with self.lock:
+            self.items[key] = (time.monotonic() + timeout, value)
+            self.items.move_to_end(key)
+            while len(self.items) > settings.TOKEN_CACHE_MAX_SIZE:
+                self.items.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self.lock:
+            for key in keys:
+                self.items.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+local_token_cache = LocalTokenCache()
+
+
+def get_token_cache():
+    if settings.TOKEN_CACHE == LOCAL_TOKEN_CACHE:
+        return local_token_cache
+    return caches[settings.TOKEN_CACHE]
+
+
+@register(Tags.caches)
+def check_token_cache(app_configs, **kwargs):
+    if settings.TOKEN_CACHE == LOCAL_TOKEN_CACHE or not isinstance(
+        caches[settings.TOKEN_CACHE], BaseDatabaseCache
+    ):
+        return []
+    return [Error(
+        'TOKEN_CACHE не может указывать на кеш в базе данных.',
+        hint='Используйте TOKEN_CACHE=local или memcached.',
+        id='api.E001',
+    )]
+
+
+def invalidate_tokens(keys):
+    keys = [token_key(key) for key in keys]
+    if keys:
+        transaction.on_commit(lambda: get_token_cache().delete_many(keys))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        cached = cache.get(token_key(key))
+        if cached is not None:
+            stats['hit'] += 1
+            return self.restore(key, cached)
+        stats['miss'] += 1
+        user, token = super().authenticate_credentials(key)
+        cache.set(
+            token_key(key),
+            {field: getattr(user, field) for field in USER_FIELDS},
+            settings.TOKEN_CACHE_TIMEOUT,
+        )
+        return user, token
+
+    def restore(self, key, values):
+        fields = [
+            field.attname for field in User._meta.concrete_fields
+            if field.attname in values
+        ]
+        user = User.from_db(
+            User.objects.db,
+            fields,
+            [values[field] for field in fields],
+        )
+        token = self.get_model().from_db(
+            User.objects.db,
+            ['key', 'user_id'],
+            [key, user.pk],
+        )
+        return user, token
@@ -0,0 +1,64 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .counters import COUNTERS, recount
+from .feed import rebuild_feeds
+from .models import Backfill
+from .scores import reset_scores
+from .search import rebuild_recipe_search
+from .shopping_list import rebuild as rebuild_shopping_lists
+
+logger = logging.getLogger(__name__)
+
+BACKFILLS = []
+
+
+def backfill(name):
+    def register(function):
+        BACKFILLS.append((name, function))
+        return function
+    return register
+
+
+def run_backfills():
+    applied = set(Backfill.objects.values_list('name', flat=True))
+    pending = [
+        (name, function) for name, function in BACKFILLS
+        if name not in applied
+    ]
+    for name, function in pending:
+        with transaction.atomic():
+            function()
+            Backfill.objects.create(name=name)
+        logger.info('Выполнено заполнение данных: %s', name)
+    if pending:
+        caches[settings.RECIPE_RESPONSE_CACHE].clear()
+
+
+@backfill('counters')
+def backfill_counters():
+    for target, field, source, relation in COUNTERS:
+        recount(target, field, source, relation)
+
+
+@backfill('recipe_scores')
+def backfill_recipe_scores():
+    reset_scores()
+
+
+@backfill('feeds')
+def backfill_feeds():
+    rebuild_feeds()
+
+
+@backfill('shopping_lists')
+def backfill_shopping_lists():
+    rebuild_shopping_lists()
+
+
+@backfill('recipe_search')
+def backfill_recipe_search():
+    rebuild_recipe_search()
@@ -0,0 +1,89 @@
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+
+from .conditional import invalidate_user_state
+from .counters import update_counters_bulk
+from .feed import follow_authors
+from .models import User
+from .scores import update_scores
+from .shopping_list import add_recipe
+
+MAX_ID = 2 ** 63 - 1
+
+
+def parse_ids(data):
+    ids = data.get('ids') if isinstance(data, dict) else None
+    if not isinstance(ids, list) or not ids:
+        raise ValidationError({'ids': 'Передайте непустой список id'})
+    if len(ids) > settings.BATCH_MAX_SIZE:
+        raise ValidationError({
+            'ids': f'Не больше {settings.BATCH_MAX_SIZE} id за запрос'
+        })
+    statuses = {}
+    for item in ids:
+        if isinstance(item, bool) or not str(item).isdecimal():
+            statuses[str(item)] = 'invalid'
+        elif int(item) > MAX_ID:
+            raise ValidationError({'ids': f'id не может быть больше {MAX_ID}'})
+        else:
+            statuses.setdefault(int(item), None)
+    return statuses
+
+
+def lock_user(user):
+    list(User.objects.select_for_update().filter(pk=user.pk).values('pk'))
+
+
+def shopping_list_created(user, recipe_ids):
+    add_recipe(user.id, *recipe_ids)
+
+
+def subscriptions_created(user, author_ids):
+    follow_authors(user.id, author_ids)
+
+
+def apply_batch(request, model, relation, target, on_create=None):
+    user = request.user
+    statuses = parse_ids(request.data)
+    ids = [item for item, value in statuses.items() if value is None]
+    found = set(
+        target.objects.filter(id__in=ids).values_list('id', flat=True)
+    )
+    lock_user(user)
+    existing = set(model.objects.filter(
+        user=user,
+        **{f'{relation}_id__in': found},
+    ).values_list(f'{relation}_id', flat=True))
+    changed = []
+    for item in ids:
+        if item not in found:
+            statuses[item] = 'not_found'
+        elif relation == 'author' and item == user.pk:
+            statuses[item] = 'self'
+        elif request.method == 'DELETE':
+            statuses[item] = 'deleted' if item in existing else 'missing'
+        else:
+            statuses[item] = 'exists' if item in existing else 'created'
+        if statuses[item] in ('created', 'deleted'):
+            changed.append(item)
+    if changed and request.method == 'DELETE':
+        model.objects.filter(
+            user=user,
+            **{f'{relation}_id__in': changed},
+        ).delete()
+    elif changed:
+        model.objects.bulk_create(
+            (model(user=user, **{f'{relation}_id': item})
+             for item in changed),
+            ignore_conflicts=True,
+        )
+        update_counters_bulk(model, changed, 1)
+        update_scores(model, changed, 1)
+        invalidate_user_state([user.pk])
+        if on_create is not None:
+            on_create(user, changed)
+    return {
+        'results': [
+            {'id': item, 'status': value} for item, value in statuses.items()
+        ]
+    }
@@ -0,0 +1,113 @@
+import base64
+import pickle
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache.backends import db
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import connections, router
+from django.utils import timezone
+
+UPSERT_VENDORS = ('postgresql', 'sqlite')
+UPSERT_BATCH_SIZE = 250
+
+
+class DatabaseCache(db.DatabaseCache):
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if not self.can_upsert():
+            return super().set(key, value, timeout, version)
+        self.upsert({key: value}, timeout, version, replace=True)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if not self.can_upsert():
+            return super().add(key, value, timeout, version)
+        return bool(self.upsert({key: value}, timeout, version, replace=False))
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if not self.can_upsert():
+            return super().set_many(data, timeout, version)
+        self.upsert(data, timeout, version, replace=True)
+        return []
+
+    def add_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if not self.can_upsert():
+            return sum(
+                self.add(key, value, timeout, version)
+                for key, value in data.items()
+            )
+        return self.upsert(data, timeout, version, replace=False)
+
+    def can_upsert(self):
+        connection = connections[router.db_for_write(self.cache_model_class)]
+        return connection.vendor in UPSERT_VENDORS
+
+    def expires(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            expires = datetime.max
+        elif settings.USE_TZ:
+            expires = datetime.utcfromtimestamp(timeout)
+        else:
+            expires = datetime.fromtimestamp(timeout)
+        return expires.replace(microsecond=0)
+
+    def upsert(self, data, timeout, version, replace):
+        if not data:
+            return 0
+        rows = {}
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            rows[key] = base64.b64encode(
+                pickle.dumps(value, self.pickle_protocol)
+            ).decode('latin1')
+        alias = router.db_for_write(self.cache_model_class)
+        connection = connections[alias]
+        quote_name = connection.ops.quote_name
+        table = quote_name(self._table)
+        now = timezone.now().replace(microsecond=0)
+        expires = connection.ops.adapt_datetimefield_value(
+            self.expires(timeout)
+        )
+        condition = ''
+        if not replace:
+            condition = f' WHERE {table}.{quote_name("expires")} < %s'
+            now_value = connection.ops.adapt_datetimefield_value(now)
+        rows = list(rows.items())
+        written = 0
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {table}')
+            if cursor.fetchone()[0] > self._max_entries:
+                self._cull(alias, cursor, now)
+            for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+                batch = rows[start:start + UPSERT_BATCH_SIZE]
+                params = [
+                    param
+                    for key, value in batch
+                    for param in (key, value, expires)
+                ]
+                if not replace:
+                    params.append(now_value)
+                cursor.execute(
+                    'INSERT INTO {table} ({key}, {value}, {expires}) '
+                    'VALUES {rows} ON CONFLICT ({key}) DO UPDATE '
+                    'SET {value} = excluded.{value}, '
+                    '{expires} = excluded.{expires}{condition}'.format(
+                        table=table,
+                        key=quote_name('cache_key'),
+                        value=quote_name('value'),
+                        expires=quote_name('expires'),
+                        rows=', '.join(['(%s, %s, %s)'] * len(batch)),
+                        condition=condition,
+                    ),
+                    params,
+                )
+                written += cursor.rowcount
+        return written
+
+
+def add_many(cache, data, timeout=None):
+    if isinstance(cache, DatabaseCache):
+        return cache.add_many(data, timeout)
+    return sum(cache.add(key, value, timeout) for key, value in data.items())
@@ -0,0 +1,133 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+
+from .reference import ingredient_reference, tag_reference
+from .response_cache import (LIST_VERSION_KEY, bump_versions, is_enabled,
+                             list_version_keys, recipe_version_key,
+                             request_versions)
+from .routers import replica_read
+
+USERS_VERSION_KEY = 'users:version'
+
+
+def user_version_key(pk):
+    return f'users:{pk}:version'
+
+
+def user_state_key(pk):
+    return f'users:{pk}:state'
+
+
+def invalidate_users(user_ids):
+    bump_versions(
+        [USERS_VERSION_KEY, *(user_version_key(pk) for pk in user_ids)]
+    )
+
+
+def invalidate_user_state(user_ids):
+    bump_versions(user_state_key(pk) for pk in user_ids)
+
+
+class ConditionalGetMixin:
+    references = ()
+
+    def conditional_response(self, request, keys, get_response):
+        if not is_enabled():
+            return get_response()
+        user = request.user
+        if user.is_authenticated:
+            keys = [*keys, user_state_key(user.pk)]
+        stored = request_versions(request, keys)
+        versions = [stored[key] for key in keys] + [
+            reference.load().version for reference in self.references
+        ]
+        etag = quote_etag(md5(repr((
+            request.get_host(),
+            request.get_full_path(),
+            request.accepted_renderer.format,
+            user.pk,
+            [version[0] for version in versions],
+        )).encode()).hexdigest())
+        last_modified = int(max(version[1] for version in versions))
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified,
+        )
+        if response is None:
+            response = get_response()
+            if (
+                response.status_code != 200
+                or replica_read()
+                or getattr(response, 'stale', False)
+            ):
+                return response
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        if user.is_authenticated:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(
+                response,
+                public=True,
+                max_age=settings.HTTP_CACHE_MAX_AGE,
+            )
+        patch_vary_headers(response, ('Accept', 'Authorization'))
+        return response
+
+
+class RecipeConditionalMixin(ConditionalGetMixin):
+    references = (tag_reference, ingredient_reference)
+
+    def list(self, request, *args, **kwargs):
+        get_response = super().list
+        return self.conditional_response(
+            request,
+            list_version_keys(request.query_params),
+            lambda: get_response(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        get_response = super().retrieve
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        if not str(pk).isdigit():
+            return get_response(request, *args, **kwargs)
+        return self.conditional_response(
+            request,
+            [recipe_version_key(int(pk))],
+            lambda: get_response(request, *args, **kwargs),
+        )
+
+
+class UserConditionalMixin(ConditionalGetMixin):
+
+    def retrieve(self, request, *args, **kwargs):
+        get_response = super().retrieve
+        if self.action == 'me':
+            pk = request.user.pk
+        else:
+            pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        if not str(pk).isdigit():
+            return get_response(request, *args, **kwargs)
+        return self.conditional_response(
+            request,
+            [user_version_key(int(pk))],
+            lambda: get_response(request, *args, **kwargs),
+        )
+
+
+class SubscriptionConditionalMixin(ConditionalGetMixin):
+
+    def list(self, request, *args, **kwargs):
+        get_response = super().list
+        if request.user.is_anonymous:
+            return get_response(request, *args, **kwargs)
+        return self.conditional_response(
+            request,
+            [USERS_VERSION_KEY, LIST_VERSION_KEY],
+            lambda: get_response(request, *args, **kwargs),
+        )
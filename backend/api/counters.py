@@ -0,0 +1,49 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Favorited, Follow, Recipe, ShoppingCart, User
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorited, 'recipe'),
+    (Recipe, 'shopping_cart_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'author'),
+)
+
+
+def update_counters(instance, delta):
+    for target, field, source, relation in COUNTERS:
+        if isinstance(instance, source):
+            target.objects.filter(
+                pk=getattr(instance, f'{relation}_id')
+            ).update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def update_counters_bulk(source, ids, delta):
+    for target, field, counter_source, relation in COUNTERS:
+        if counter_source is source and ids:
+            target.objects.filter(pk__in=ids).update(
+                **{field: Greatest(F(field) + delta, 0)}
+            )
+
+
+def actual_count(source, relation):
+    return Coalesce(
+        Subquery(
+            source.objects.filter(
+                **{relation: OuterRef('pk')}
+            ).order_by().values(relation).annotate(
+                count=Count('pk')
+            ).values('count')
+        ),
+        0,
+    )
+
+
+def recount(target, field, source, relation):
+    stale = target.objects.annotate(
+        actual=actual_count(source, relation)
+    ).exclude(**{field: F('actual')}).count()
+    if stale:
+        target.objects.update(**{field: actual_count(source, relation)})
+    return stale
@@ -1,27 +1,96 @@
-from io import BytesIO
+import csv
+import os
+import shutil
+from functools import lru_cache
+from io import StringIO
+from tempfile import SpooledTemporaryFile
 
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import simpleSplit
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfgen import canvas
 
+FONT_NAME = 'Arial'
+FONT_SIZE = 14
+LINE_HEIGHT = 20
+LEFT_MARGIN = 100
+TOP_LINE = 760
+BOTTOM_LINE = 60
+SPOOL_MAX_SIZE = 1024 * 1024
 
-def create_shopping_cart_pdf(ingredients):
-    pdf = BytesIO()
-    pdf_obj = canvas.Canvas(pdf)
-    arial = TTFont('Arial', 'arial.ttf')
-    pdfmetrics.registerFont(arial)
-    pdf_obj.setFont('Arial', 14)
-    line_num = 760
+
+@lru_cache(maxsize=None)
+def register_font():
+    pdfmetrics.registerFont(
+        TTFont(FONT_NAME, os.path.join(settings.BASE_DIR, 'arial.ttf'))
+    )
+
+
+def shopping_cart_lines(ingredients):
     for ingredient in ingredients:
-        pdf_obj.drawString(
-            100,
-            line_num,
-            (f'{ingredient["ingredient__name"]} - '
-             f'{ingredient["amount"]} '
-             f'{ingredient["ingredient__measurement_unit"]}'),
-        )
-        line_num -= 20
+        yield (f'{ingredient["ingredient__name"]} - '
+               f'{ingredient["amount"]} '
+               f'{ingredient["ingredient__measurement_unit"]}')
+
+
+def create_shopping_cart_pdf(ingredients):
+    register_font()
+    pdf = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    pdf_obj = canvas.Canvas(pdf, pagesize=A4)
+    pdf_obj.setFont(FONT_NAME, FONT_SIZE)
+    max_width = A4[0] - 2 * LEFT_MARGIN
+    line_num = TOP_LINE
+    for line in shopping_cart_lines(ingredients):
+        for part in simpleSplit(line, FONT_NAME, FONT_SIZE, max_width):
+            if line_num < BOTTOM_LINE:
+                pdf_obj.showPage()
+                pdf_obj.setFont(FONT_NAME, FONT_SIZE)
+                line_num = TOP_LINE
+            pdf_obj.drawString(LEFT_MARGIN, line_num, part)
+            line_num -= LINE_HEIGHT
     pdf_obj.showPage()
     pdf_obj.save()
     pdf.seek(0)
     return pdf
+
+
+def create_shopping_cart_txt(ingredients):
+    txt = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    for line in shopping_cart_lines(ingredients):
+        txt.write(f'{line}\n'.encode())
+    txt.seek(0)
+    return txt
+
+
+def create_shopping_cart_csv(ingredients):
+    csv_file = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    row = StringIO()
+    writer = csv.writer(row)
+    writer.writerow(('name', 'amount', 'measurement_unit'))
+    for ingredient in ingredients:
+        writer.writerow((
+            ingredient['ingredient__name'],
+            ingredient['amount'],
+            ingredient['ingredient__measurement_unit'],
+        ))
+        csv_file.write(row.getvalue().encode())
+        row.seek(0)
+        row.truncate()
+    csv_file.write(row.getvalue().encode())
+    csv_file.seek(0)
+    return csv_file
+
+
+SHOPPING_CART_FORMATS = {
+    'pdf': create_shopping_cart_pdf,
+    'txt': create_shopping_cart_txt,
+    'csv': create_shopping_cart_csv,
+}
+
+
+def write_shopping_cart(export_format, ingredients, path):
+    with SHOPPING_CART_FORMATS[export_format](ingredients) as source:
+        with open(path, 'wb') as target:
+            shutil.copyfileobj(source, target)
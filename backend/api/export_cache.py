@@ -0,0 +1,137 @@
+import os
+from concurrent import futures
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from threading import BoundedSemaphore, Lock
+from uuid import uuid4
+
+from django.conf import settings
+from rest_framework.exceptions import APIException
+
+from .create_pdf import write_shopping_cart
+
+OFFLOADED_FORMATS = ('pdf', )
+
+executor = None
+executor_lock = Lock()
+render_slots = BoundedSemaphore(
+    settings.SHOPPING_LIST_RENDER_WORKERS
+    + settings.SHOPPING_LIST_RENDER_QUEUE
+)
+
+
+class RenderBusy(APIException):
+    status_code = 503
+    default_detail = 'Сервер перегружен, попробуйте позже'
+    default_code = 'render_busy'
+
+    def __init__(self, detail=None, code=None):
+        super().__init__(detail, code)
+        self.wait = settings.SHOPPING_LIST_RENDER_RETRY_AFTER
+
+
+class RenderTimeout(RenderBusy):
+    default_detail = 'Список покупок не успел сформироваться, попробуйте позже'
+    default_code = 'render_timeout'
+
+
+def get_executor():
+    global executor
+    with executor_lock:
+        if executor is None:
+            executor = ProcessPoolExecutor(
+                max_workers=settings.SHOPPING_LIST_RENDER_WORKERS,
+                mp_context=get_context('spawn'),
+            )
+    return executor
+
+
+def reset_executor(broken):
+    global executor
+    with executor_lock:
+        if executor is broken:
+            executor = None
+    broken.shutdown(wait=False)
+
+
+def render_shopping_list(export_format, ingredients, path):
+    if (
+        export_format not in OFFLOADED_FORMATS
+        or not settings.SHOPPING_LIST_RENDER_WORKERS
+    ):
+        write_shopping_cart(export_format, ingredients, path)
+        return
+    if not render_slots.acquire(
+        timeout=settings.SHOPPING_LIST_RENDER_TIMEOUT
+    ):
+        raise RenderBusy()
+    pool = get_executor()
+    try:
+        pool.submit(
+            write_shopping_cart,
+            export_format,
+            list(ingredients),
+            path,
+        ).result(timeout=settings.SHOPPING_LIST_RENDER_TIMEOUT)
+    except futures.TimeoutError:
+        raise RenderTimeout()
+    except BrokenProcessPool:
+        reset_executor(pool)
+        raise RenderBusy()
+    finally:
+        render_slots.release()
+
+
+def shopping_list_key(user, export_format):
+    return f'{user.id}-{user.shopping_list_version}.{export_format}'
+
+
+def evict(user, keep):
+    current = os.path.splitext(os.path.basename(keep))[0]
+    entries = []
+    for entry in os.scandir(settings.SHOPPING_LIST_CACHE_DIR):
+        if entry.path == keep or entry.name.endswith('.tmp'):
+            continue
+        try:
+            if (
+                entry.name.startswith(f'{user.id}-')
+                and not entry.name.startswith(f'{current}.')
+            ):
+                os.remove(entry.path)
+                continue
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries) + os.path.getsize(keep)
+    for _, size, path in sorted(entries):
+        if total <= settings.SHOPPING_LIST_CACHE_MAX_SIZE:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def cached_shopping_list(user, export_format, ingredients):
+    path = os.path.join(
+        settings.SHOPPING_LIST_CACHE_DIR,
+        shopping_list_key(user, export_format),
+    )
+    try:
+        os.utime(path)
+        return open(path, 'rb')
+    except FileNotFoundError:
+        pass
+    os.makedirs(settings.SHOPPING_LIST_CACHE_DIR, exist_ok=True)
+    temp_path = f'{path}.{uuid4().hex}.tmp'
+    try:
+        render_shopping_list(export_format, ingredients, temp_path)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    evict(user, path)
+    return open(path, 'rb')
@@ -0,0 +1,170 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, Q
+
+from .models import FeedEntry, Follow, Recipe, User
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=max(settings.FEED_FANOUT_WORKERS, 1),
+    thread_name_prefix='feed',
+)
+
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def recent_recipes(author_id):
+    return list(Recipe.objects.filter(
+        author_id=author_id,
+    ).order_by('-pub_date', 'id').values_list(
+        'id',
+        'pub_date',
+    )[:settings.FEED_MAX_LENGTH])
+
+
+def trim_feeds(user_ids):
+    limit = settings.FEED_MAX_LENGTH
+    overflowing = FeedEntry.objects.filter(
+        user_id__in=user_ids,
+    ).order_by().values('user_id').annotate(
+        total=Count('id'),
+    ).filter(
+        total__gt=limit + settings.FEED_TRIM_SLACK,
+    ).values_list('user_id', flat=True)
+    for user_id in overflowing:
+        entries = FeedEntry.objects.filter(user_id=user_id)
+        pub_date, recipe_id = entries.order_by(
+            '-pub_date',
+            'recipe_id',
+        ).values_list('pub_date', 'recipe_id')[limit]
+        entries.filter(
+            Q(pub_date__lt=pub_date)
+            | Q(pub_date=pub_date, recipe_id__gte=recipe_id)
+        ).delete()
+
+
+def fan_out(recipe_id):
+    recipe = Recipe.objects.filter(pk=recipe_id).values(
+        'author_id',
+        'pub_date',
+    ).first()
+    if recipe is None:
+        return 0
+    followers = Follow.objects.filter(
+        author_id=recipe['author_id'],
+    ).order_by('user_id').values_list('user_id', flat=True)
+    last = 0
+    total = 0
+    while True:
+        chunk = list(
+            followers.filter(user_id__gt=last)[:settings.FEED_BATCH_SIZE]
+        )
+        if not chunk:
+            return total
+        FeedEntry.objects.bulk_create(
+            (FeedEntry(user_id=user_id, recipe_id=recipe_id, **recipe)
+             for user_id in chunk),
+            ignore_conflicts=True,
+        )
+        trim_feeds(chunk)
+        total += len(chunk)
+        last = chunk[-1]
+
+
+def fan_out_in_background(recipe_id):
+    try:
+        fan_out(recipe_id)
+    except Exception:
+        logger.exception('Не удалось разослать рецепт %s по лентам', recipe_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_fan_out(recipe):
+    followers = User.objects.filter(pk=recipe.author_id).values_list(
+        'followers_count',
+        flat=True,
+    ).first()
+    if not followers or followers >= settings.FEED_CELEBRITY_FOLLOWERS:
+        return
+    if (
+        followers <= settings.FEED_FANOUT_INLINE_LIMIT
+        or not settings.FEED_FANOUT_WORKERS
+    ):
+        fan_out(recipe.pk)
+        return
+    recipe_id = recipe.pk
+    transaction.on_commit(
+        lambda: executor.submit(fan_out_in_background, recipe_id)
+    )
+
+
+def follow_authors(user_id, author_ids):
+    authors = User.objects.filter(
+        pk__in=author_ids,
+        followers_count__lt=settings.FEED_CELEBRITY_FOLLOWERS,
+    ).values_list('pk', flat=True)
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, recipe_id=recipe_id, author_id=author_id,
+                   pub_date=pub_date)
+         for author_id in authors
+         for recipe_id, pub_date in recent_recipes(author_id)),
+        ignore_conflicts=True,
+    )
+    trim_feeds([user_id])
+
+
+def unfollow_authors(user_id, author_ids):
+    FeedEntry.objects.filter(
+        user_id=user_id,
+        author_id__in=author_ids,
+    ).delete()
+
+
+def rebuild_feeds(authors=None):
+    if authors is None:
+        authors = User.objects.all()
+    FeedEntry.objects.filter(author__in=authors).delete()
+    followers = set()
+    for author_id in authors.filter(
+        followers_count__gt=0,
+        followers_count__lt=settings.FEED_CELEBRITY_FOLLOWERS,
+    ).values_list('pk', flat=True):
+        recipes = recent_recipes(author_id)
+        if not recipes:
+            continue
+        users = list(Follow.objects.filter(
+            author_id=author_id,
+        ).values_list('user_id', flat=True))
+        FeedEntry.objects.bulk_create(
+            (FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                       author_id=author_id, pub_date=pub_date)
+             for user_id in users
+             for recipe_id, pub_date in recipes),
+            batch_size=settings.FEED_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        followers.update(users)
+    for chunk in chunks(sorted(followers), settings.FEED_BATCH_SIZE):
+        trim_feeds(chunk)
+    return len(followers)
+
+
+def feed_sources(user):
+    sources = [(FeedEntry.objects.filter(user=user), 'recipe_id')]
+    celebrities = list(Follow.objects.filter(
+        user=user,
+        author__followers_count__gte=settings.FEED_CELEBRITY_FOLLOWERS,
+    ).values_list('author_id', flat=True))
+    if celebrities:
+        sources.append(
+            (Recipe.objects.filter(author_id__in=celebrities), 'id')
+        )
+    return sources
@@ -0,0 +1,61 @@
+from django.db.models import Count, Exists, OuterRef
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Favorited, IngredientRecipe, Recipe, ShoppingCart
+from .reference import tag_reference
+from .scores import SCORE_FIELDS
+from .search import search_recipes
+
+
+def filter_recipes(queryset, query_params, user):
+    for param, model in (('is_favorited', Favorited),
+                         ('is_in_shopping_cart', ShoppingCart)):
+        if query_params.get(param) != '1':
+            continue
+        if user.is_anonymous:
+            return queryset.none()
+        queryset = queryset.filter(
+            pk__in=model.objects.filter(user=user).values('recipe_id')
+        )
+    slugs = set(query_params.getlist('tags'))
+    if slugs:
+        tag_ids = [
+            tag['id'] for tag in tag_reference.all() if tag['slug'] in slugs
+        ]
+        queryset = queryset.annotate(
+            has_tags=Exists(Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'),
+                tag_id__in=tag_ids,
+            ))
+        ).filter(has_tags=True)
+    author_id = query_params.get('author')
+    if author_id:
+        if not author_id.isdigit():
+            return queryset.none()
+        queryset = queryset.filter(author_id=author_id)
+    ingredient_ids = set(query_params.getlist('ingredients'))
+    if ingredient_ids:
+        if not all(id.isdigit() for id in ingredient_ids):
+            return queryset.none()
+        queryset = queryset.filter(
+            pk__in=IngredientRecipe.objects.filter(
+                ingredient_id__in=ingredient_ids
+            ).values('recipe_id').annotate(
+                matched=Count('ingredient_id', distinct=True)
+            ).filter(matched=len(ingredient_ids)).values('recipe_id')
+        )
+    query = query_params.get('search', '').strip()
+    if query:
+        queryset = search_recipes(queryset, query)
+    field = SCORE_FIELDS.get(query_params.get('ordering'))
+    if field is not None:
+        queryset = queryset.order_by(f'-{field}', 'id')
+    return queryset
+
+
+class RecipeFilterBackend(BaseFilterBackend):
+
+    def filter_queryset(self, request, queryset, view):
+        if view.action != 'list':
+            return queryset
+        return filter_recipes(queryset, request.query_params, request.user)
@@ -0,0 +1,99 @@
+import binascii
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image
+from rest_framework import serializers
+
+from .models import Recipe
+from .response_cache import invalidate_recipes
+from .storage import content_storage
+
+logger = logging.getLogger(__name__)
+
+DECODE_CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_SIZE = 1024 * 1024
+THUMBNAIL_DIR = 'recipes/thumbnails/'
+
+executor = ThreadPoolExecutor(
+    max_workers=max(settings.IMAGE_THUMBNAIL_WORKERS, 1),
+    thread_name_prefix='thumbnails',
+)
+
+
+def decode_base64_image(data):
+    header, _, encoded = data.partition(';base64,')
+    ext = header.split('/')[-1].lower()
+    if len(encoded) * 3 // 4 > settings.IMAGE_MAX_SIZE:
+        raise serializers.ValidationError(
+            f'Размер изображения превышает '
+            f'{settings.IMAGE_MAX_SIZE // (1024 * 1024)} МБ'
+        )
+    image_file = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    digest = sha256()
+    try:
+        for start in range(0, len(encoded), DECODE_CHUNK_SIZE):
+            chunk = binascii.a2b_base64(
+                encoded[start:start + DECODE_CHUNK_SIZE]
+            )
+            digest.update(chunk)
+            image_file.write(chunk)
+    except binascii.Error:
+        raise serializers.ValidationError('Некорректные данные изображения')
+    image_file.seek(0)
+    try:
+        with Image.open(image_file) as image:
+            if max(image.size) > settings.IMAGE_MAX_DIMENSION:
+                raise serializers.ValidationError(
+                    f'Стороны изображения не должны превышать '
+                    f'{settings.IMAGE_MAX_DIMENSION} пикселей'
+                )
+            image.verify()
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise serializers.ValidationError('Загрузите корректное изображение')
+    image_file.seek(0)
+    return File(image_file, name=f'{digest.hexdigest()}.{ext}')
+
+
+def thumbnail_name(name):
+    root = os.path.splitext(os.path.basename(name))[0]
+    return f'{THUMBNAIL_DIR}{root}.webp'
+
+
+def make_thumbnail(name):
+    try:
+        thumbnail = thumbnail_name(name)
+        if not content_storage.exists(thumbnail):
+            buffer = BytesIO()
+            with content_storage.open(name) as source:
+                with Image.open(source) as image:
+                    image.thumbnail((settings.IMAGE_THUMBNAIL_SIZE, ) * 2)
+                    image.save(buffer, 'WEBP', quality=80)
+            thumbnail = content_storage.save(
+                thumbnail,
+                ContentFile(buffer.getvalue()),
+            )
+        recipes = Recipe.objects.filter(image=name)
+        recipe_ids = list(recipes.values_list('id', flat=True))
+        recipes.update(image_thumbnail=thumbnail)
+        invalidate_recipes(recipe_ids)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру для %s', name)
+    finally:
+        if settings.IMAGE_THUMBNAIL_WORKERS:
+            connections.close_all()
+
+
+def schedule_thumbnail(name):
+    if not settings.IMAGE_THUMBNAIL_WORKERS:
+        transaction.on_commit(lambda: make_thumbnail(name))
+        return
+    transaction.on_commit(lambda: executor.submit(make_thumbnail, name))
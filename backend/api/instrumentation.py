@@ -0,0 +1,230 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import BaseDatabaseCache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework import serializers
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+
+from .authentication import stats as token_cache_stats
+from .response_cache import stats as response_cache_stats
+
+logger = logging.getLogger(__name__)
+
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+METRICS = (
+    ('requests_total', 'counter', 'Количество запросов'),
+    ('queries_total', 'counter', 'Количество SQL-запросов'),
+    ('cache_queries_total', 'counter', 'SQL-запросы к кешу в базе данных'),
+    ('db_seconds_total', 'counter', 'Время в базе данных'),
+    ('serialization_seconds_total', 'counter', 'Время сериализации'),
+    ('latency_seconds_total', 'counter', 'Полное время ответа'),
+    ('n_plus_one_total', 'counter', 'Повторяющиеся запросы (N+1)'),
+)
+
+local = threading.local()
+lock = threading.Lock()
+stats = defaultdict(Counter)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def cache_tables():
+    return {
+        cache._table for cache in (caches[alias] for alias in settings.CACHES)
+        if isinstance(cache, BaseDatabaseCache)
+    }
+
+
+class RequestRecord:
+
+    def __init__(self, cache_tables=()):
+        self.cache_tables = cache_tables
+        self.queries = []
+        self.cache_queries = 0
+        self.db_time = 0.0
+        self.serialization_time = 0.0
+        self.serialization_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            if self.is_cache_query(sql, context['connection']):
+                self.cache_queries += 1
+            else:
+                self.queries.append(sql)
+
+    def is_cache_query(self, sql, connection):
+        return any(
+            connection.ops.quote_name(table) in sql
+            for table in self.cache_tables
+        )
+
+    def duplicates(self):
+        fingerprints = Counter(
+            IN_LIST.sub('IN (...)', sql) for sql in self.queries
+        )
+        return {
+            sql: count for sql, count in fingerprints.items()
+            if count >= settings.API_INSTRUMENTATION_N_PLUS_ONE_THRESHOLD
+        }
+
+
+def timed_data(prop):
+    def data(self):
+        record = getattr(local, 'record', None)
+        if record is None or record.serialization_depth:
+            return prop.fget(self)
+        record.serialization_depth += 1
+        start = time.perf_counter()
+        try:
+            return prop.fget(self)
+        finally:
+            record.serialization_time += time.perf_counter() - start
+            record.serialization_depth -= 1
+    data.instrumented = True
+    return property(data)
+
+
+def instrument_serializers():
+    for serializer_class in (serializers.Serializer,
+                             serializers.ListSerializer):
+        prop = serializer_class.__dict__['data']
+        if not getattr(prop.fget, 'instrumented', False):
+            serializer_class.data = timed_data(prop)
+
+
+def view_name(request):
+    match = request.resolver_match
+    if match is None:
+        return 'unresolved'
+    if match.url_name is None:
+        return match.route
+    return match.view_name
+
+
+def record_stats(name, values):
+    with lock:
+        stats[name].update(values)
+
+
+def prometheus_text():
+    lines = []
+    with lock:
+        snapshot = {name: Counter(values) for name, values in stats.items()}
+    for metric, kind, description in METRICS:
+        lines.append(f'# HELP foodgram_api_{metric} {description}')
+        lines.append(f'# TYPE foodgram_api_{metric} {kind}')
+        for name, values in sorted(snapshot.items()):
+            method, view = name
+            lines.append(
+                f'foodgram_api_{metric}{{method="{method}",view="{view}"}} '
+                f'{values[metric]:g}'
+            )
+    lines.append('# HELP foodgram_token_cache_total Обращения к кешу токенов')
+    lines.append('# TYPE foodgram_token_cache_total counter')
+    for result in ('hit', 'miss'):
+        lines.append(
+            f'foodgram_token_cache_total{{result="{result}"}} '
+            f'{token_cache_stats[result]}'
+        )
+    lines.append(
+        '# HELP foodgram_response_cache_total Обращения к кешу ответов'
+    )
+    lines.append('# TYPE foodgram_response_cache_total counter')
+    for result in ('hit', 'stale', 'miss'):
+        lines.append(
+            f'foodgram_response_cache_total{{result="{result}"}} '
+            f'{response_cache_stats[result]}'
+        )
+    return '\n'.join(lines) + '\n'
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics(request):
+    if not settings.API_INSTRUMENTATION:
+        return HttpResponse(status=404)
+    return HttpResponse(
+        prometheus_text(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+class InstrumentationMiddleware:
+
+    def __init__(self, get_response):
+        if not settings.API_INSTRUMENTATION:
+            raise MiddlewareNotUsed()
+        instrument_serializers()
+        self.cache_tables = cache_tables()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        record = RequestRecord(self.cache_tables)
+        local.record = record
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(record))
+                response = self.get_response(request)
+        finally:
+            local.record = None
+        total = time.perf_counter() - start
+        name = (request.method, view_name(request))
+        duplicates = record.duplicates()
+        record_stats(name, {
+            'requests_total': 1,
+            'queries_total': len(record.queries),
+            'cache_queries_total': record.cache_queries,
+            'db_seconds_total': record.db_time,
+            'serialization_seconds_total': record.serialization_time,
+            'latency_seconds_total': total,
+            'n_plus_one_total': len(duplicates),
+        })
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={record.db_time * 1000:.1f};'
+            f'desc="{len(record.queries)} queries, '
+            f'{record.cache_queries} cache"',
+            f'serialize;dur={record.serialization_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+        logger.info(
+            'view=%s method=%s status=%s queries=%d cache_queries=%d '
+            'db_ms=%.1f serialize_ms=%.1f total_ms=%.1f n_plus_one=%d',
+            name[1], name[0], response.status_code, len(record.queries),
+            record.cache_queries, record.db_time * 1000,
+            record.serialization_time * 1000, total * 1000, len(duplicates),
+        )
+        for sql, count in duplicates.items():
+            logger.warning('N+1 in %s: %d x %s', name[1], count, sql)
+        self.check_budget(name[1], len(record.queries))
+        return response
+
+    def check_budget(self, name, queries):
+        budget = settings.API_QUERY_BUDGETS.get(
+            name,
+            settings.API_QUERY_BUDGET_DEFAULT,
+        )
+        mode = settings.API_QUERY_BUDGET_MODE
+        if budget is None or queries <= budget or mode == 'off':
+            return
+        message = f'{name}: {queries} запросов при бюджете {budget}'
+        if mode == 'raise':
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
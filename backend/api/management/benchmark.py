@@ -0,0 +1,72 @@
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.authentication import local_token_cache
+from api.reference import ingredient_reference, tag_reference
+from api.shopping_list import bump_versions
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def make_client(user=None):
+    client = APIClient(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+    if user is not None:
+        client.force_authenticate(user)
+    return client
+
+
+def reset_caches(user=None):
+    for alias in settings.CACHES:
+        caches[alias].clear()
+    local_token_cache.clear()
+    tag_reference.bump()
+    ingredient_reference.bump()
+    if user is not None:
+        bump_versions([user.pk])
+
+
+def run_scenario(client, path, params, requests, warmup=1,
+                 memory_requests=3, reset=None):
+    for _ in range(warmup):
+        client.get(path, params)
+    timings = []
+    queries = []
+    statuses = set()
+    for _ in range(requests):
+        if reset is not None:
+            reset()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.get(path, params)
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(captured))
+        statuses.add(response.status_code)
+    memory = []
+    for _ in range(memory_requests):
+        if reset is not None:
+            reset()
+        tracemalloc.start()
+        client.get(path, params)
+        memory.append(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+    return {
+        'path': path,
+        'params': params,
+        'requests': requests,
+        'status': sorted(statuses),
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'max_ms': round(max(timings), 2),
+        'queries': round(sum(queries) / len(queries), 2),
+        'max_queries': max(queries),
+        'peak_memory_kb': round(max(memory), 1) if memory else None,
+    }
@@ -0,0 +1,80 @@
+import csv
+import json
+import os
+import re
+import time
+
+from django.core.management.base import CommandError
+from django.db import transaction
+
+BATCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+SEPARATORS = re.compile(r'[\s,]*')
+
+
+def iter_json(file):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        if not started and position < len(buffer):
+            if buffer[position] != '[':
+                raise CommandError('Ожидался JSON-массив объектов')
+            started = True
+            position += 1
+            continue
+        if started and buffer.startswith(']', position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file.read(CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Некорректный JSON в файле')
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+
+
+def iter_csv(file, fields):
+    for row in csv.reader(file):
+        if not row or row == list(fields):
+            continue
+        yield dict(zip(fields, row))
+
+
+def read_items(path, fields):
+    if not os.path.exists(path):
+        raise CommandError(f'Файл {path} не найден')
+    with open(path, encoding='utf-8', newline='') as file:
+        if path.endswith('.csv'):
+            yield from iter_csv(file, fields)
+        else:
+            yield from iter_json(file)
+
+
+def bulk_load(model, items, fields, key_fields, batch_size=BATCH_SIZE):
+    start = time.monotonic()
+    read = 0
+    batch = []
+    with transaction.atomic():
+        before = model.objects.count()
+        existing = set(model.objects.values_list(*key_fields))
+        for item in items:
+            read += 1
+            key = tuple(item[field] for field in key_fields)
+            if key in existing:
+                continue
+            existing.add(key)
+            batch.append(model(**{field: item[field] for field in fields}))
+            if len(batch) >= batch_size:
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        model.objects.bulk_create(batch, ignore_conflicts=True)
+        created = model.objects.count() - before
+    elapsed = time.monotonic() - start
+    return (f'Обработано записей: {read}, добавлено: {created} '
+            f'за {elapsed:.2f} с ({read / max(elapsed, 1e-6):.0f} записей/с)')
@@ -0,0 +1,114 @@
+import json
+from functools import partial
+
+from api.management.benchmark import make_client, reset_caches, run_scenario
+from api.management.synthetic import (add_scale_arguments, generate,
+                                      scale_options)
+from api.models import ShoppingCart, User
+from api.reference import ingredient_reference, tag_reference
+from api.search import recipe_index
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+
+class Command(BaseCommand):
+    help = ('Измеряет задержку, число запросов и память для основных '
+            'эндпоинтов API. С --generate данные создаются в транзакции, '
+            'которая откатывается. С --cold кэши очищаются перед каждым '
+            'запросом.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--generate', action='store_true')
+        add_scale_arguments(parser)
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=1)
+        parser.add_argument('--cold', action='store_true')
+        parser.add_argument('--output')
+        parser.add_argument('--compare')
+
+    def scenarios(self, user):
+        tags = [tag['slug'] for tag in tag_reference.all()[:2]]
+        return (
+            ('recipes_anonymous', None, '/api/recipes/',
+             {'page': 1, 'limit': 6}),
+            ('recipes', user, '/api/recipes/', {'page': 1, 'limit': 6}),
+            ('recipes_tags', user, '/api/recipes/',
+             {'page': 1, 'limit': 6, 'tags': tags}),
+            ('recipes_favorited', user, '/api/recipes/',
+             {'page': 1, 'limit': 6, 'is_favorited': 1}),
+            ('recipes_popular_tags', user, '/api/recipes/',
+             {'limit': 6, 'ordering': 'popular', 'tags': tags}),
+            ('feed', user, '/api/recipes/feed/', {'limit': 6}),
+            ('subscriptions', user, '/api/users/subscriptions/',
+             {'page': 1, 'limit': 6, 'recipes_limit': 3}),
+            ('shopping_cart_txt', user, '/api/recipes/download_shopping_cart/',
+             {'format': 'txt'}),
+            ('shopping_cart_pdf', user, '/api/recipes/download_shopping_cart/',
+             {'format': 'pdf'}),
+        )
+
+    def run(self, options):
+        user_id = ShoppingCart.objects.values_list(
+            'user_id', flat=True
+        ).first()
+        if user_id is None:
+            raise CommandError(
+                'Нет пользователей со списком покупок, используйте --generate'
+            )
+        user = User.objects.get(id=user_id)
+        results = {}
+        for name, scenario_user, path, params in self.scenarios(user):
+            reset = None
+            if options['cold']:
+                reset = partial(reset_caches, scenario_user)
+            results[name] = run_scenario(
+                make_client(scenario_user),
+                path,
+                params,
+                options['requests'],
+                options['warmup'],
+                reset=reset,
+            )
+            self.stdout.write(
+                f'{name}: p50={results[name]["p50_ms"]}ms '
+                f'p95={results[name]["p95_ms"]}ms '
+                f'queries={results[name]["queries"]} '
+                f'memory={results[name]["peak_memory_kb"]}KiB'
+            )
+        return results
+
+    def handle(self, *args, **options):
+        if options['generate']:
+            with transaction.atomic():
+                generate(**scale_options(options))
+                tag_reference.bump()
+                ingredient_reference.bump()
+                results = self.run(options)
+                transaction.set_rollback(True)
+            recipe_index.reset()
+            tag_reference.bump()
+            ingredient_reference.bump()
+        else:
+            results = self.run(options)
+        report = {
+            'database': connection.vendor,
+            'scale': scale_options(options) if options['generate'] else None,
+            'requests': options['requests'],
+            'cold': options['cold'],
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if options['compare']:
+            with open(options['compare']) as file:
+                baseline = json.load(file)['results']
+            for name, result in results.items():
+                if name not in baseline:
+                    continue
+                before = baseline[name]
+                self.stdout.write(
+                    f'{name}: p50 {before["p50_ms"]} -> {result["p50_ms"]}ms, '
+                    f'p95 {before["p95_ms"]} -> {result["p95_ms"]}ms, '
+                    f'queries {before["queries"]} -> {result["queries"]}'
+                )
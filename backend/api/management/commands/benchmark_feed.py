@@ -0,0 +1,141 @@
+import random
+import time
+
+from api.feed import fan_out, feed_sources, rebuild_feeds
+from api.management.benchmark import percentile
+from api.management.synthetic import (add_scale_arguments, generate,
+                                      scale_options)
+from api.models import FeedEntry, Follow, Recipe, User
+from api.paginations import FeedPagination
+from api.reference import ingredient_reference, tag_reference
+from api.search import recipe_index
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+
+def pull_page(user, limit):
+    return list(Recipe.objects.filter(
+        author__in=Follow.objects.filter(user=user).values('author'),
+    ).order_by('-pub_date', 'id')[:limit + 1])
+
+
+def push_page(user, limit):
+    request = Request(APIRequestFactory().get('/', {'limit': limit}))
+    return FeedPagination().paginate_sources(
+        feed_sources(user),
+        Recipe.objects.all(),
+        request,
+    )
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает ленту подписок на заранее заполненных лентах '
+            '(fan-out при публикации) со сборкой ленты при чтении. '
+            'Данные создаются в транзакции, которая откатывается.')
+
+    def add_arguments(self, parser):
+        add_scale_arguments(parser)
+        parser.add_argument('--celebrities', type=int, default=1)
+        parser.add_argument('--celebrity-followers', type=int)
+        parser.add_argument('--samples', type=int, default=50)
+        parser.add_argument('--writes', type=int, default=20)
+        parser.add_argument('--limit', type=int, default=6)
+
+    def report(self, title, timings):
+        self.stdout.write(
+            f'{title}: p50={percentile(timings, 50):.2f}ms '
+            f'p95={percentile(timings, 95):.2f}ms '
+            f'max={max(timings):.2f}ms'
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        threshold = options['celebrity_followers'] or max(
+            options['users'] // 2, 1
+        )
+        with transaction.atomic(), override_settings(
+            FEED_CELEBRITY_FOLLOWERS=threshold
+        ):
+            data = generate(**scale_options(options))
+            tag_reference.bump()
+            ingredient_reference.bump()
+            user_ids = data['users']
+            celebrities = user_ids[:options['celebrities']]
+            Follow.objects.bulk_create(
+                (Follow(user_id=user_id, author_id=author_id)
+                 for author_id in celebrities
+                 for user_id in user_ids if user_id != author_id),
+                ignore_conflicts=True,
+            )
+            for author_id in celebrities:
+                User.objects.filter(pk=author_id).update(
+                    followers_count=Follow.objects.filter(
+                        author_id=author_id
+                    ).count()
+                )
+            rebuild_feeds()
+            self.stdout.write(
+                f'users={len(user_ids)} recipes={len(data["recipes"])} '
+                f'celebrities={len(celebrities)} threshold={threshold} '
+                f'feed_entries={FeedEntry.objects.count()}'
+            )
+
+            readers = rng.sample(user_ids, min(options['samples'],
+                                               len(user_ids)))
+            readers = list(User.objects.filter(pk__in=readers))
+            self.stdout.write('== план ленты при чтении')
+            self.stdout.write(Recipe.objects.filter(
+                author__in=Follow.objects.filter(
+                    user=readers[0]
+                ).values('author'),
+            ).order_by('-pub_date', 'id')[:options['limit'] + 1].explain())
+            self.stdout.write('== план заполненной ленты')
+            self.stdout.write(FeedEntry.objects.filter(
+                user=readers[0]
+            ).order_by('-pub_date', 'recipe_id').values_list(
+                'pub_date', 'recipe_id'
+            )[:options['limit'] + 1].explain())
+            for title, function in (('чтение, сборка при запросе', pull_page),
+                                    ('чтение, fan-out', push_page)):
+                function(readers[0], options['limit'])
+                self.report(title, [
+                    timed(function, reader, options['limit'])
+                    for reader in readers
+                ])
+
+            authors = list(User.objects.filter(
+                followers_count__gt=0,
+                followers_count__lt=threshold,
+            ).order_by('-followers_count').values_list(
+                'pk', 'followers_count'
+            )[:options['writes']])
+            timings = []
+            followers = 0
+            for author_id, count in authors:
+                recipe = Recipe.objects.create(
+                    author_id=author_id,
+                    name='benchmark',
+                    text='benchmark',
+                    cooking_time=1,
+                )
+                FeedEntry.objects.filter(recipe=recipe).delete()
+                timings.append(timed(fan_out, recipe.pk))
+                followers += count
+            if timings:
+                self.report(
+                    f'публикация, fan-out на {followers / len(timings):.0f} '
+                    f'подписчиков', timings
+                )
+            transaction.set_rollback(True)
+        recipe_index.reset()
+        tag_reference.bump()
+        ingredient_reference.bump()
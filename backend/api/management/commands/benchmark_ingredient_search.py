@@ -0,0 +1,52 @@
+import random
+import time
+
+from api.management.benchmark import percentile
+from api.management.synthetic import random_name
+from api.models import Ingredient
+from api.reference import ingredient_reference
+from api.views import IngredientViewSet
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+
+
+class Command(BaseCommand):
+    help = ('Измеряет задержку поиска ингредиентов на синтетических данных. '
+            'Данные создаются в транзакции, которая откатывается.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        view = IngredientViewSet.as_view({'get': 'list'})
+        factory = APIRequestFactory()
+        with transaction.atomic():
+            Ingredient.objects.bulk_create(
+                Ingredient(name=f'{random_name(rng)} {number}',
+                           measurement_unit='г')
+                for number in range(options['count'])
+            )
+            ingredient_reference.bump()
+            queries = [
+                random_name(rng)[:rng.randint(1, 4)]
+                for _ in range(options['queries'])
+            ]
+            view(factory.get('/api/ingredients/', {'name': queries[0]}))
+            timings = []
+            for query in queries:
+                request = factory.get('/api/ingredients/', {'name': query})
+                start = time.perf_counter()
+                view(request).render()
+                timings.append((time.perf_counter() - start) * 1000)
+            transaction.set_rollback(True)
+        ingredient_reference.bump()
+        self.stdout.write(
+            f'ingredients={options["count"]} queries={len(timings)} '
+            f'p50={percentile(timings, 50):.2f}ms '
+            f'p95={percentile(timings, 95):.2f}ms '
+            f'max={max(timings):.2f}ms'
+        )
@@ -0,0 +1,69 @@
+import time
+
+from api.filters import filter_recipes
+from api.management.synthetic import generate
+from api.models import Recipe, User
+from api.reference import ingredient_reference, tag_reference
+from api.search import recipe_index
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import QueryDict
+
+
+def measure(queryset, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        list(queryset[:6])
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает планы и время запросов фильтрации рецептов: '
+            'JOIN + DISTINCT против подзапросов. Данные создаются '
+            'в транзакции, которая откатывается.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            data = generate(
+                users=options['users'],
+                recipes=options['recipes'],
+                favorites_per_user=50,
+            )
+            tag_reference.bump()
+            user = User.objects.get(id=data['users'][0])
+            slugs = [tag['slug'] for tag in tag_reference.all()[:2]]
+            cases = (
+                ('теги', {'tags': slugs}),
+                ('теги + избранное', {'tags': slugs, 'is_favorited': ['1']}),
+            )
+            for title, query in cases:
+                params = QueryDict(mutable=True)
+                for key, values in query.items():
+                    params.setlist(key, values)
+                legacy = Recipe.objects.with_user_flags(user).filter(
+                    tags__slug__in=slugs
+                ).distinct()
+                if 'is_favorited' in query:
+                    legacy = legacy.filter(favorited__user=user)
+                current = filter_recipes(
+                    Recipe.objects.with_user_flags(user),
+                    params,
+                    user,
+                )
+                for variant, queryset in (('JOIN + DISTINCT', legacy),
+                                          ('подзапросы', current)):
+                    self.stdout.write(f'== {title}: {variant}')
+                    self.stdout.write(queryset.explain())
+                    median = measure(queryset, options['repeat'])
+                    self.stdout.write(f'median={median:.2f}ms')
+            transaction.set_rollback(True)
+        recipe_index.reset()
+        tag_reference.bump()
+        ingredient_reference.bump()
@@ -0,0 +1,85 @@
+import random
+import time
+
+from api.management.benchmark import percentile
+from api.management.synthetic import generate, random_name
+from api.models import IngredientRecipe
+from api.reference import ingredient_reference, tag_reference
+from api.search import recipe_index
+from api.views import RecipeViewSet
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+
+
+class Command(BaseCommand):
+    help = ('Измеряет задержку полнотекстового поиска рецептов '
+            'и поиска по ингредиентам на синтетических данных. '
+            'Данные создаются в транзакции, которая откатывается.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000000)
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def measure(self, view, factory, params_list, limit):
+        timings = []
+        for params in params_list:
+            request = factory.get('/api/recipes/', {**params, 'limit': limit})
+            start = time.perf_counter()
+            view(request).render()
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        view = RecipeViewSet.as_view({'get': 'list'})
+        factory = APIRequestFactory()
+        with transaction.atomic():
+            data = generate(
+                users=options['users'],
+                recipes=options['recipes'],
+                ingredients=options['ingredients'],
+                follows_per_user=0,
+                favorites_per_user=0,
+                cart_per_user=0,
+                seed=options['seed'],
+            )
+            ingredient_reference.bump()
+            tag_reference.bump()
+            recipe_ids = data['recipes']
+            cases = (
+                ('одно слово', [
+                    {'search': random_name(rng)}
+                    for _ in range(options['queries'])
+                ]),
+                ('два слова', [
+                    {'search': f'{random_name(rng)} {random_name(rng)}'}
+                    for _ in range(options['queries'])
+                ]),
+                ('все ингредиенты', [
+                    {'ingredients': list(IngredientRecipe.objects.filter(
+                        recipe_id=rng.choice(recipe_ids)
+                    ).values_list('ingredient_id', flat=True)[:2])}
+                    for _ in range(options['queries'])
+                ]),
+            )
+            for title, params_list in cases:
+                view(factory.get('/api/recipes/', params_list[0]))
+                timings = self.measure(
+                    view, factory, params_list, options['limit']
+                )
+                self.stdout.write(
+                    f'{title}: recipes={len(recipe_ids)} '
+                    f'queries={len(timings)} '
+                    f'p50={percentile(timings, 50):.2f}ms '
+                    f'p95={percentile(timings, 95):.2f}ms '
+                    f'max={max(timings):.2f}ms'
+                )
+            transaction.set_rollback(True)
+        recipe_index.reset()
+        ingredient_reference.bump()
+        tag_reference.bump()
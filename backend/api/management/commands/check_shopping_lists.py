@@ -0,0 +1,21 @@
+from api.shopping_list import find_inconsistent_users, rebuild
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = ('Сверяет сохранённые списки покупок с агрегатом по корзинам '
+            'и при --fix пересобирает расходящиеся')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        user_ids = find_inconsistent_users()
+        self.stdout.write(
+            f'Пользователей с расхождениями: {len(user_ids)}'
+        )
+        if user_ids and options['fix']:
+            rebuild(user_ids)
+            self.stdout.write(self.style.SUCCESS('Списки пересобраны'))
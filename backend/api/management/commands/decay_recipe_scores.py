@@ -0,0 +1,23 @@
+from api.scores import decay_scores, reset_scores
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = ('Применяет затухание к рейтингам популярности рецептов. '
+            'Запускайте периодически, передавая интервал между запусками. '
+            'С --reset рейтинги заново заполняются из счётчиков избранного '
+            'и списков покупок.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=1)
+        parser.add_argument('--reset', action='store_true')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        if options['reset']:
+            count = reset_scores()
+            self.stdout.write(f'Рейтинги пересчитаны: {count}')
+            return
+        count = decay_scores(options['hours'])
+        self.stdout.write(f'Рейтинги обновлены: {count}')
@@ -0,0 +1,24 @@
+from api.management.synthetic import (add_scale_arguments, generate,
+                                      scale_options)
+from api.reference import ingredient_reference, tag_reference
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, рецептами, '
+            'подписками, избранным и списками покупок.')
+
+    def add_arguments(self, parser):
+        add_scale_arguments(parser)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            data = generate(**scale_options(options))
+        tag_reference.bump()
+        ingredient_reference.bump()
+        self.stdout.write(
+            f'Создано: пользователей {len(data["users"])}, '
+            f'рецептов {len(data["recipes"])}, '
+            f'ингредиентов {len(data["ingredients"])}'
+        )
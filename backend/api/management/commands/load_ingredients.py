@@ -1,22 +1,32 @@
-import json
 import os
 
+from api.management.bulk_load import BATCH_SIZE, bulk_load, read_items
 from api.models import Ingredient
+from api.reference import ingredient_reference
+from django.conf import settings
 from django.core.management.base import BaseCommand
 
+FIELDS = ('name', 'measurement_unit')
+
 
 class Command(BaseCommand):
+    help = 'Загружает ингредиенты из JSON или CSV файла'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=os.path.join(settings.BASE_DIR, 'ingredients.json'),
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
 
     def handle(self, *args, **options):
-        print(os.path.abspath(__file__))
-        f = open('/app/ingredients.json')
-        json_string = f.read()
-        f.close()
-        data = json.loads(json_string)
-        for item in data:
-            name = item['name']
-            measurement_unit = item['measurement_unit']
-            Ingredient.objects.get_or_create(
-                name=name,
-                measurement_unit=measurement_unit,
-            )
+        report = bulk_load(
+            Ingredient,
+            read_items(options['path'], FIELDS),
+            FIELDS,
+            FIELDS,
+            options['batch_size'],
+        )
+        ingredient_reference.bump()
+        self.stdout.write(self.style.SUCCESS(report))
@@ -1,21 +1,33 @@
+from api.management.bulk_load import BATCH_SIZE, bulk_load, read_items
 from api.models import Tag
+from api.reference import tag_reference
 from django.core.management.base import BaseCommand
 
+FIELDS = ('name', 'color', 'slug')
+TAGS = ({'name': 'завтрак', 'color': '#1bfd9c', 'slug': 'breakfast'},
+        {'name': 'обед', 'color': '#0180d4', 'slug': 'lunch'},
+        {'name': 'ужин', 'color': '#e4a32f', 'slug': 'dinner'},
+        {'name': 'суп', 'color': '#fbbaf7', 'slug': 'soup'},
+        {'name': 'гарнир', 'color': '#cc3333', 'slug': 'garnish'},)
+
 
 class Command(BaseCommand):
+    help = 'Загружает теги из JSON или CSV файла или стандартный набор'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
 
     def handle(self, *args, **options):
-        data = ({'name': 'завтрак', 'color': '#1bfd9c', 'slug': 'breakfast'},
-                {'name': 'обед', 'color': '#0180d4', 'slug': 'lunch'},
-                {'name': 'ужин', 'color': '#e4a32f', 'slug': 'dinner'},
-                {'name': 'суп', 'color': '#fbbaf7', 'slug': 'soup'},
-                {'name': 'гарнир', 'color': '#cc3333', 'slug': 'garnish'},)
-        for item in data:
-            name = item['name']
-            color = item['color']
-            slug = item['slug']
-            Tag.objects.get_or_create(
-                name=name,
-                color=color,
-                slug=slug,
-            )
+        items = TAGS
+        if options['path']:
+            items = read_items(options['path'], FIELDS)
+        report = bulk_load(
+            Tag,
+            items,
+            FIELDS,
+            ('slug', ),
+            options['batch_size'],
+        )
+        tag_reference.bump()
+        self.stdout.write(self.style.SUCCESS(report))
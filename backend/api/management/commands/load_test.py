@@ -0,0 +1,71 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from api.management.benchmark import percentile
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = ('Нагружает запущенный сервер параллельными запросами и '
+            'выводит пропускную способность и задержки. Используется '
+            'для сравнения конфигураций gunicorn при одинаковом '
+            'числе воркеров.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('url')
+        parser.add_argument('--token')
+        parser.add_argument('--host')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--output')
+
+    def fetch(self, url, headers, timeout):
+        start = time.perf_counter()
+        try:
+            with urlopen(Request(url, headers=headers),
+                         timeout=timeout) as response:
+                response.read()
+                status = response.status
+        except HTTPError as error:
+            status = error.code
+        except (URLError, OSError):
+            status = None
+        return status, (time.perf_counter() - start) * 1000
+
+    def handle(self, *args, **options):
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        if options['host']:
+            headers['Host'] = options['host']
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            results = list(executor.map(
+                lambda _: self.fetch(
+                    options['url'], headers, options['timeout']
+                ),
+                range(options['requests']),
+            ))
+        elapsed = time.perf_counter() - start
+        timings = [timing for _, timing in results]
+        errors = sum(
+            1 for status, _ in results if status is None or status >= 400
+        )
+        report = {
+            'url': options['url'],
+            'concurrency': options['concurrency'],
+            'requests': options['requests'],
+            'errors': errors,
+            'rps': round(len(results) / elapsed, 1),
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'max_ms': round(max(timings), 2),
+        }
+        self.stdout.write(json.dumps(report, ensure_ascii=False))
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
@@ -0,0 +1,13 @@
+from api.feed import rebuild_feeds
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = ('Заново заполняет ленты подписок из последних рецептов '
+            'авторов. Рецепты знаменитостей в ленты не копируются.')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        count = rebuild_feeds()
+        self.stdout.write(f'Обновлено лент: {count}')
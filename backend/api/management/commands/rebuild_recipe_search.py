@@ -0,0 +1,10 @@
+from api.search import rebuild_recipe_search
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает поисковый индекс рецептов.'
+
+    def handle(self, *args, **options):
+        count = rebuild_recipe_search()
+        self.stdout.write(f'Проиндексировано рецептов: {count}')
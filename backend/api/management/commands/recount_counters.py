@@ -0,0 +1,16 @@
+from api.counters import COUNTERS, recount
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает денормализованные счётчики избранного, '
+            'списков покупок, рецептов и подписчиков')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        for target, field, source, relation in COUNTERS:
+            stale = recount(target, field, source, relation)
+            self.stdout.write(
+                f'{target.__name__}.{field}: исправлено записей: {stale}'
+            )
@@ -0,0 +1,20 @@
+from api.response_cache import get_metrics, reset_metrics
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Показывает статистику кеша ответов для анонимных запросов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true')
+
+    def handle(self, *args, **options):
+        metrics = get_metrics()
+        total = sum(metrics.values())
+        ratio = (metrics['hit'] + metrics['stale']) / total if total else 0
+        self.stdout.write(
+            f'hit={metrics["hit"]} stale={metrics["stale"]} '
+            f'miss={metrics["miss"]} hit_ratio={ratio:.2%}'
+        )
+        if options['reset']:
+            reset_metrics()
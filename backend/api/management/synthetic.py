@@ -0,0 +1,138 @@
+import random
+from uuid import uuid4
+
+from django.contrib.auth.hashers import make_password
+
+from api.counters import COUNTERS, actual_count
+from api.feed import rebuild_feeds
+from api.models import (Favorited, Follow, Ingredient, IngredientRecipe,
+                        Recipe, ShoppingCart, Tag, User)
+from api.scores import reset_scores
+from api.search import rebuild_recipe_search
+from api.shopping_list import rebuild
+
+SYLLABLES = ('ба', 'ве', 'го', 'ду', 'жи', 'за', 'ки', 'ло', 'ма', 'не',
+             'по', 'ру', 'са', 'ти', 'фу', 'ха', 'це', 'чи', 'ша', 'ю')
+
+
+def random_name(rng):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 5)))
+
+
+def random_text(rng, words):
+    return ' '.join(random_name(rng) for _ in range(words))
+
+
+def sample(rng, population, count):
+    return rng.sample(population, min(count, len(population)))
+
+
+def generate(users=100, recipes=1000, ingredients=500,
+             ingredients_per_recipe=6, tags_per_recipe=2, follows_per_user=10,
+             favorites_per_user=20, cart_per_user=5, seed=0):
+    rng = random.Random(seed)
+    prefix = f'synthetic-{uuid4().hex[:8]}'
+    password = make_password(None)
+
+    if not Tag.objects.exists():
+        Tag.objects.bulk_create(
+            Tag(name=f'тег {number}', color='#000000', slug=f'tag{number}')
+            for number in range(5)
+        )
+    tag_ids = list(Tag.objects.values_list('id', flat=True))
+
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'{prefix} ингредиент {number}', measurement_unit='г')
+        for number in range(ingredients)
+    )
+    ingredient_ids = list(Ingredient.objects.filter(
+        name__startswith=prefix
+    ).values_list('id', flat=True))
+
+    User.objects.bulk_create(
+        User(username=f'{prefix}-{number}',
+             email=f'{prefix}-{number}@example.com',
+             password=password)
+        for number in range(users)
+    )
+    user_ids = list(User.objects.filter(
+        username__startswith=prefix
+    ).values_list('id', flat=True))
+
+    Recipe.objects.bulk_create(
+        Recipe(author_id=rng.choice(user_ids),
+               name=f'{prefix} {random_text(rng, 3)}',
+               text=random_text(rng, 30),
+               cooking_time=rng.randint(1, 120))
+        for number in range(recipes)
+    )
+    recipe_ids = list(Recipe.objects.filter(
+        name__startswith=prefix
+    ).values_list('id', flat=True))
+
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+        for recipe_id in recipe_ids
+        for tag_id in sample(rng, tag_ids, tags_per_recipe)
+    )
+    IngredientRecipe.objects.bulk_create(
+        IngredientRecipe(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                         amount=rng.randint(1, 500))
+        for recipe_id in recipe_ids
+        for ingredient_id in sample(
+            rng, ingredient_ids, ingredients_per_recipe
+        )
+    )
+    Follow.objects.bulk_create(
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id in user_ids
+        for author_id in sample(rng, user_ids, follows_per_user)
+        if author_id != user_id
+    )
+    Favorited.objects.bulk_create(
+        Favorited(user_id=user_id, recipe_id=recipe_id)
+        for user_id in user_ids
+        for recipe_id in sample(rng, recipe_ids, favorites_per_user)
+    )
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user_id=user_id, recipe_id=recipe_id)
+        for user_id in user_ids
+        for recipe_id in sample(rng, recipe_ids, cart_per_user)
+    )
+    users_scope = User.objects.filter(username__startswith=prefix)
+    recipes_scope = Recipe.objects.filter(name__startswith=prefix)
+    for target, field, source, relation in COUNTERS:
+        scope = users_scope if target is User else recipes_scope
+        scope.update(**{field: actual_count(source, relation)})
+    reset_scores(recipes_scope)
+    rebuild(user_ids)
+    rebuild_recipe_search()
+    rebuild_feeds(users_scope)
+    return {
+        'users': user_ids,
+        'recipes': recipe_ids,
+        'ingredients': ingredient_ids,
+        'tags': tag_ids,
+    }
+
+
+def add_scale_arguments(parser):
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--recipes', type=int, default=1000)
+    parser.add_argument('--ingredients', type=int, default=500)
+    parser.add_argument('--ingredients-per-recipe', type=int, default=6)
+    parser.add_argument('--tags-per-recipe', type=int, default=2)
+    parser.add_argument('--follows-per-user', type=int, default=10)
+    parser.add_argument('--favorites-per-user', type=int, default=20)
+    parser.add_argument('--cart-per-user', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def scale_options(options):
+    return {
+        name: options[name]
+        for name in ('users', 'recipes', 'ingredients',
+                     'ingredients_per_recipe', 'tags_per_recipe',
+                     'follows_per_user', 'favorites_per_user',
+                     'cart_per_user', 'seed')
+    }
@@ -1,11 +1,21 @@
 from colorfield.fields import ColorField
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import BooleanField, Exists, OuterRef, Value
+
+from .storage import content_storage
 
 
 class User(AbstractUser):
     email = models.EmailField(unique=True)
+    recipes_count = models.PositiveIntegerField(default=0, editable=False)
+    followers_count = models.PositiveIntegerField(default=0, editable=False)
+    shopping_list_version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+    )
 
 
 class Tag(models.Model):
@@ -21,6 +31,46 @@ class Ingredient(models.Model):
     name = models.CharField(max_length=200)
     measurement_unit = models.CharField(max_length=200)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient',
+            )
+        ]
+
+
+class RecipeQuerySet(models.QuerySet):
+
+    def with_related(self):
+        return self.select_related('author').prefetch_related(
+            'tags',
+            'ingredients',
+        )
+
+    def with_user_flags(self, user):
+        if user.is_anonymous:
+            false = Value(False, output_field=BooleanField())
+            return self.annotate(
+                is_favorited=false,
+                is_in_shopping_cart=false,
+                author_is_subscribed=false,
+            )
+        return self.annotate(
+            is_favorited=Exists(Favorited.objects.filter(
+                user=user,
+                recipe=OuterRef('pk'),
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user,
+                recipe=OuterRef('pk'),
+            )),
+            author_is_subscribed=Exists(Follow.objects.filter(
+                user=user,
+                author=OuterRef('author'),
+            )),
+        )
+
 
 class Recipe(models.Model):
     tags = models.ManyToManyField(
@@ -34,18 +84,54 @@ class Recipe(models.Model):
     name = models.CharField(max_length=200)
     image = models.ImageField(
         upload_to='recipes/images/',
+        storage=content_storage,
         null=True,
         default=None
     )
+    image_thumbnail = models.ImageField(
+        upload_to='recipes/thumbnails/',
+        storage=content_storage,
+        null=True,
+        default=None,
+        editable=False,
+    )
     text = models.TextField()
     cooking_time = models.IntegerField(validators=[MinValueValidator(1)])
     pub_date = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True
     )
+    favorites_count = models.PositiveIntegerField(default=0, editable=False)
+    shopping_cart_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
+    popularity_score = models.FloatField(default=0, editable=False)
+    trending_score = models.FloatField(default=0, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', 'id'],
+                name='recipe_pub_date_id_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='recipe_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['-popularity_score', 'id'],
+                name='recipe_popularity_idx',
+            ),
+            models.Index(
+                fields=['-trending_score', 'id'],
+                name='recipe_trending_idx',
+            ),
+        ]
 
 
 class IngredientRecipe(models.Model):
@@ -115,3 +201,59 @@ class ShoppingCart(models.Model):
                 name='unique_shopping_cart',
             )
         ]
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+    )
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
+    total_amount = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item',
+            )
+        ]
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry',
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', 'recipe'],
+                name='feed_user_pub_date_idx',
+            ),
+        ]
+
+
+class Backfill(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    applied_at = models.DateTimeField(auto_now_add=True)
@@ -1,5 +1,175 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+from operator import itemgetter
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def estimate_count(queryset):
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']['Plan Rows']
 
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class KeysetPagination(BasePagination):
+    page_size = 6
+    page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    count_modes = ('exact', 'estimate', 'none')
+    ordering = ('-pub_date', 'id')
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return page_size if page_size > 0 else self.page_size
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(b64decode(encoded.encode()).decode())
+            if (
+                not isinstance(values, list)
+                or len(values) != len(self.ordering)
+            ):
+                raise ValueError(encoded)
+            values = [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+            if None in values:
+                raise ValueError(encoded)
+            return values
+        except (BinasciiError, UnicodeDecodeError, ValueError, TypeError,
+                ValidationError):
+            raise NotFound('Неверный курсор')
+
+    def encode_cursor(self, obj):
+        values = []
+        for field in self.ordering:
+            value = getattr(obj, field.lstrip('-'))
+            values.append(
+                value.isoformat() if hasattr(value, 'isoformat') else value
+            )
+        return b64encode(json.dumps(values).encode()).decode()
+
+    def filter_after(self, queryset, values):
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return queryset.filter(condition)
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param, 'exact')
+        if mode not in self.count_modes:
+            mode = 'exact'
+        if mode == 'none':
+            return None
+        if mode == 'estimate':
+            return estimate_count(queryset)
+        return queryset.count()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.ordering = getattr(view, 'cursor_ordering', self.ordering)
+        self.request = request
+        self.count = self.get_count(queryset, request)
+        values = self.decode_cursor(request, queryset.model)
+        queryset = queryset.order_by(*self.ordering)
+        if values is not None:
+            queryset = self.filter_after(queryset, values)
+        page_size = self.get_page_size(request)
+        page = list(queryset[:page_size + 1])
+        self.has_next = len(page) > page_size
+        self.page = page[:page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.page[-1]),
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
+
+
+class FeedPagination(KeysetPagination):
+
+    def paginate_sources(self, sources, recipes, request):
+        self.request = request
+        self.count = None
+        values = self.decode_cursor(request, recipes.model)
+        page_size = self.get_page_size(request)
+        candidates = set()
+        for queryset, field in sources:
+            queryset = queryset.order_by('-pub_date', field)
+            if values is not None:
+                pub_date, pk = values
+                queryset = queryset.filter(
+                    Q(pub_date__lt=pub_date)
+                    | Q(pub_date=pub_date, **{f'{field}__gt': pk})
+                )
+            candidates.update(
+                queryset.values_list('pub_date', field)[:page_size + 1]
+            )
+        keys = sorted(
+            sorted(candidates, key=itemgetter(1)),
+            key=itemgetter(0),
+            reverse=True,
+        )
+        self.has_next = len(keys) > page_size
+        ids = [pk for _, pk in keys[:page_size]]
+        found = recipes.in_bulk(ids)
+        self.page = [found[pk] for pk in ids if pk in found]
+        return self.page
+
+
+class CustomCursorPagination(CustomPagination):
+    keyset_pagination_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        cursor_query_param = self.keyset_pagination_class.cursor_query_param
+        if cursor_query_param not in request.query_params:
+            return super().paginate_queryset(queryset, request, view)
+        self.keyset = self.keyset_pagination_class()
+        return self.keyset.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is None:
+            return super().get_paginated_response(data)
+        return self.keyset.get_paginated_response(data)
@@ -0,0 +1,145 @@
+import time
+from threading import Lock
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+
+from .cache import add_many
+from .models import Ingredient, Tag
+
+
+def new_version():
+    return uuid4().hex, time.time()
+
+
+class CacheVersionStore:
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def get(self, key):
+        version = self.cache.get(key)
+        if version is None:
+            self.cache.add(key, new_version(), None)
+            version = self.cache.get(key)
+        return version
+
+    def get_many(self, keys):
+        versions = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in versions]
+        if missing:
+            add_many(self.cache, {key: new_version() for key in missing})
+            versions.update(self.cache.get_many(missing))
+        return versions
+
+    def bump(self, key):
+        self.cache.set(key, new_version(), None)
+
+    def bump_many(self, keys):
+        self.cache.set_many({key: new_version() for key in keys}, None)
+
+
+def get_version_store():
+    return CacheVersionStore(settings.REFERENCE_CACHE)
+
+
+class ReferenceData:
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = fields
+        self.key = f'reference:{model._meta.label_lower}'
+        self.lock = Lock()
+        self.version = None
+        self.checked = None
+        self.items = []
+        self.by_id = {}
+
+    def bump(self):
+        get_version_store().bump(self.key)
+        self.checked = None
+
+    def load(self):
+        now = time.monotonic()
+        if (
+            self.checked is not None
+            and now - self.checked < settings.REFERENCE_CACHE_CHECK_INTERVAL
+        ):
+            return self
+        version = get_version_store().get(self.key)
+        if version != self.version:
+            with self.lock:
+                if version != self.version:
+                    items = list(self.model.objects.using(
+                        DEFAULT_DB_ALIAS
+                    ).order_by('pk').values(*self.fields))
+                    self.items = items
+                    self.by_id = {item['id']: item for item in items}
+                    self.version = version
+        self.checked = now
+        return self
+
+    def all(self):
+        return self.load().items
+
+    def get(self, pk):
+        try:
+            return self.load().by_id.get(int(pk))
+        except (TypeError, ValueError):
+            return None
+
+    def etag(self):
+        return quote_etag(f'{self.key}:{self.load().version[0]}')
+
+    def last_modified(self):
+        return int(self.load().version[1])
+
+
+tag_reference = ReferenceData(Tag, ('id', 'name', 'color', 'slug'))
+ingredient_reference = ReferenceData(
+    Ingredient,
+    ('id', 'name', 'measurement_unit'),
+)
+
+
+class ReferenceCacheMixin:
+    reference = None
+
+    def conditional_response(self, request, get_data):
+        etag = self.reference.etag()
+        last_modified = self.reference.last_modified()
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified,
+        )
+        if response is None:
+            response = Response(get_data())
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        def get_data():
+            queryset = self.get_queryset()
+            filtered = self.filter_queryset(queryset)
+            if filtered is queryset:
+                return self.reference.all()
+            return [
+                self.reference.get(obj.pk)
+                or self.get_serializer(obj).data
+                for obj in filtered
+            ]
+        return self.conditional_response(request, get_data)
+
+    def retrieve(self, request, *args, **kwargs):
+        item = self.reference.get(kwargs[self.lookup_url_kwarg or 'pk'])
+        if item is None:
+            raise NotFound()
+        return self.conditional_response(request, lambda: item)
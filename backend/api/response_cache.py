@@ -0,0 +1,267 @@
+import threading
+import time
+from collections import Counter
+from hashlib import md5
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from rest_framework.response import Response
+
+from .reference import CacheVersionStore, ingredient_reference, tag_reference
+from .routers import replica_read
+
+LIST_PARAMS = ('tags', 'author', 'page', 'limit', 'cursor', 'count',
+               'search', 'ingredients', 'is_favorited', 'is_in_shopping_cart',
+               'ordering')
+LIST_VERSION_KEY = 'recipes:version'
+SCORES_VERSION_KEY = 'recipes:scores:version'
+METRICS = ('hit', 'stale', 'miss')
+PROCESS_LOCAL_CACHES = (DummyCache, LocMemCache)
+
+pending = threading.local()
+stats = Counter()
+stats_lock = threading.Lock()
+unflushed = Counter()
+flushed_at = time.monotonic()
+
+
+def get_cache():
+    return caches[settings.RECIPE_RESPONSE_CACHE]
+
+
+def is_enabled():
+    return not isinstance(get_cache(), PROCESS_LOCAL_CACHES)
+
+
+def get_fragment_cache():
+    return caches[settings.RECIPE_FRAGMENT_CACHE]
+
+
+def get_versions():
+    return CacheVersionStore(settings.RECIPE_RESPONSE_CACHE)
+
+
+def recipe_version_key(pk):
+    return f'recipes:{pk}:version'
+
+
+def fragment_key(pk, variant):
+    return f'recipes:fragment:{variant}:{pk}'
+
+
+def reference_versions():
+    return (
+        tag_reference.load().version[0],
+        ingredient_reference.load().version[0],
+    )
+
+
+def metric_key(name):
+    return f'recipes:response:metrics:{name}'
+
+
+def normalize_params(query_params):
+    return urlencode(sorted(
+        (param, value)
+        for param in LIST_PARAMS
+        for value in set(query_params.getlist(param))
+    ))
+
+
+def list_version_keys(query_params):
+    if query_params.get('ordering'):
+        return [LIST_VERSION_KEY, SCORES_VERSION_KEY]
+    return [LIST_VERSION_KEY]
+
+
+def bump_versions(keys):
+    if not hasattr(pending, 'keys'):
+        pending.keys = set()
+    pending.keys.update(keys)
+
+    def bump():
+        keys, pending.keys = pending.keys, set()
+        if keys:
+            get_versions().bump_many(keys)
+    transaction.on_commit(bump)
+
+
+def invalidate_scores():
+    bump_versions([SCORES_VERSION_KEY])
+
+
+def invalidate_recipes(recipe_ids):
+    bump_versions(
+        [LIST_VERSION_KEY, *(recipe_version_key(pk) for pk in recipe_ids)]
+    )
+
+
+def count(name):
+    global flushed_at
+    now = time.monotonic()
+    with stats_lock:
+        stats[name] += 1
+        unflushed[name] += 1
+        if now - flushed_at < settings.RECIPE_RESPONSE_CACHE_METRICS_INTERVAL:
+            return
+        values = dict(unflushed)
+        unflushed.clear()
+        flushed_at = now
+    flush_metrics(values)
+
+
+def flush_metrics(values):
+    cache = get_cache()
+    for name, value in values.items():
+        try:
+            cache.incr(metric_key(name), value)
+        except ValueError:
+            if not cache.add(metric_key(name), value, None):
+                cache.incr(metric_key(name), value)
+
+
+def get_metrics():
+    values = get_cache().get_many([metric_key(name) for name in METRICS])
+    with stats_lock:
+        return {
+            name: values.get(metric_key(name), 0) + unflushed[name]
+            for name in METRICS
+        }
+
+
+def reset_metrics():
+    with stats_lock:
+        unflushed.clear()
+    get_cache().delete_many([metric_key(name) for name in METRICS])
+
+
+def request_versions(request, keys):
+    versions = getattr(request, 'cache_versions', None)
+    if versions is None:
+        versions = request.cache_versions = {}
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        versions.update(get_versions().get_many(missing))
+    return versions
+
+
+def render_recipes(serializer, recipes, variant):
+    if not recipes:
+        return []
+    cache = get_fragment_cache()
+    keys = [fragment_key(recipe.pk, variant) for recipe in recipes]
+    flags = [serializer.user_flags(recipe) for recipe in recipes]
+    if is_enabled():
+        references = reference_versions()
+        versions = get_versions().get_many(
+            [recipe_version_key(recipe.pk) for recipe in recipes]
+        )
+        fragments = cache.get_many(keys)
+        stale = {}
+        for recipe, key in zip(recipes, keys):
+            version = (versions[recipe_version_key(recipe.pk)], *references)
+            fragment = fragments.get(key)
+            if fragment is None or fragment['version'] != version:
+                stale[key] = (recipe, version)
+    else:
+        fragments = {}
+        stale = {key: (recipe, None) for recipe, key in zip(recipes, keys)}
+    if stale:
+        prefetch_related_objects(
+            [recipe for recipe, _ in stale.values()],
+            'tags',
+            'ingredients',
+        )
+        for key, (recipe, version) in stale.items():
+            fragments[key] = {
+                'version': version,
+                'data': serializer.shared_representation(recipe),
+            }
+        if is_enabled() and not replica_read():
+            cache.set_many(
+                {key: fragments[key] for key in stale},
+                settings.RECIPE_FRAGMENT_CACHE_TIMEOUT,
+            )
+    result = []
+    for key, (recipe_flags, is_subscribed) in zip(keys, flags):
+        data = fragments[key]['data'].copy()
+        data.update(recipe_flags)
+        data['author'] = data['author'].copy()
+        data['author']['is_subscribed'] = is_subscribed
+        result.append(data)
+    return result
+
+
+class AnonymousResponseCacheMixin:
+
+    def cached_response(self, request, key, version_keys, get_response):
+        if not request.user.is_anonymous or not is_enabled():
+            return get_response()
+        cache = get_cache()
+        key = 'recipes:response:' + md5(
+            f'{request.get_host()}:{key}'.encode()
+        ).hexdigest()
+        versions = request_versions(request, version_keys)
+        version = (
+            *(versions[version_key] for version_key in version_keys),
+            *reference_versions(),
+        )
+        entry = cache.get(key)
+        now = time.time()
+        if entry is not None:
+            if entry['version'] == version and now < entry['fresh_until']:
+                return self.cache_hit(entry, 'hit')
+            if not cache.add(
+                f'{key}:lock',
+                True,
+                settings.RECIPE_RESPONSE_CACHE_LOCK_TIMEOUT,
+            ):
+                return self.cache_hit(entry, 'stale')
+        try:
+            response = get_response()
+            if response.status_code == 200 and not replica_read():
+                timeout = settings.RECIPE_RESPONSE_CACHE_TIMEOUT
+                cache.set(key, {
+                    'version': version,
+                    'fresh_until': now + timeout,
+                    'data': response.data,
+                }, timeout + settings.RECIPE_RESPONSE_CACHE_STALE)
+        finally:
+            if entry is not None:
+                cache.delete(f'{key}:lock')
+        count('miss')
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def cache_hit(self, entry, metric):
+        count(metric)
+        response = Response(entry['data'])
+        response['X-Cache'] = metric.upper()
+        response.stale = metric == 'stale'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        get_response = super().list
+        return self.cached_response(
+            request,
+            f'list:{normalize_params(request.query_params)}',
+            list_version_keys(request.query_params),
+            lambda: get_response(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        get_response = super().retrieve
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        if not str(pk).isdigit():
+            return get_response(request, *args, **kwargs)
+        return self.cached_response(
+            request,
+            f'detail:{int(pk)}',
+            [recipe_version_key(int(pk))],
+            lambda: get_response(request, *args, **kwargs),
+        )
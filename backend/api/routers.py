@@ -0,0 +1,79 @@
+import random
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+
+local = threading.local()
+
+PRIMARY_APP_LABELS = ('django_cache', )
+
+
+def pin_key(user_id):
+    return f'db:pin:{user_id}'
+
+
+def replica_read():
+    return getattr(local, 'use_replica', False)
+
+
+def is_pinned(request):
+    user = request.user
+    return user.is_authenticated and caches[
+        settings.DB_REPLICA_PIN_CACHE
+    ].get(pin_key(user.pk)) is not None
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APP_LABELS:
+            return 'default'
+        if replica_read():
+            return random.choice(settings.DB_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+class ReplicaReadMixin:
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        local.use_replica = (
+            bool(settings.DB_REPLICAS)
+            and request.method in SAFE_METHODS
+            and not is_pinned(request)
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        local.use_replica = False
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class PrimaryPinMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        user = getattr(request, 'user', None)
+        if (
+            settings.DB_REPLICAS
+            and request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and user is not None
+            and user.is_authenticated
+        ):
+            caches[settings.DB_REPLICA_PIN_CACHE].set(
+                pin_key(user.pk),
+                True,
+                settings.DB_REPLICA_PIN_SECONDS,
+            )
+        return response
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .models import Favorited, Recipe, ShoppingCart
+from .response_cache import invalidate_scores
+
+SCORE_FIELDS = {
+    'popular': 'popularity_score',
+    'trending': 'trending_score',
+}
+
+
+def score_weight(source):
+    if source is Favorited:
+        return settings.RECIPE_SCORE_FAVORITE_WEIGHT
+    if source is ShoppingCart:
+        return settings.RECIPE_SCORE_SHOPPING_CART_WEIGHT
+    return None
+
+
+def update_scores(source, recipe_ids, delta):
+    weight = score_weight(source)
+    if weight is None or not recipe_ids:
+        return
+    Recipe.objects.filter(pk__in=recipe_ids).update(**{
+        field: Greatest(F(field) + weight * delta, 0.0)
+        for field in SCORE_FIELDS.values()
+    })
+    invalidate_scores()
+
+
+def decay_scores(hours):
+    updated = 0
+    for field, half_life in (
+        ('popularity_score', settings.RECIPE_POPULAR_HALF_LIFE_HOURS),
+        ('trending_score', settings.RECIPE_TRENDING_HALF_LIFE_HOURS),
+    ):
+        factor = 0.5 ** (hours / half_life)
+        updated += Recipe.objects.filter(**{f'{field}__gt': 0}).update(
+            **{field: F(field) * factor}
+        )
+        Recipe.objects.filter(**{
+            f'{field}__gt': 0,
+            f'{field}__lt': settings.RECIPE_SCORE_MIN,
+        }).update(**{field: 0.0})
+    invalidate_scores()
+    return updated
+
+
+def reset_scores(recipes=None):
+    score = (
+        F('favorites_count') * settings.RECIPE_SCORE_FAVORITE_WEIGHT
+        + F('shopping_cart_count') * settings.RECIPE_SCORE_SHOPPING_CART_WEIGHT
+    )
+    if recipes is None:
+        recipes = Recipe.objects.all()
+    updated = recipes.update(**{
+        field: score for field in SCORE_FIELDS.values()
+    })
+    invalidate_scores()
+    return updated
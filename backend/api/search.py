@@ -0,0 +1,233 @@
+import math
+import re
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from threading import Lock
+
+from django.conf import settings
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections
+from django.db.models import Case, F, FloatField, Value, When
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+from .models import Ingredient, Recipe
+from .reference import ingredient_reference
+from .response_cache import LIST_VERSION_KEY, get_versions
+
+
+class IngredientIndex:
+
+    def __init__(self):
+        self.items = None
+        self.entries = []
+
+    def get_entries(self):
+        items = ingredient_reference.all()
+        if items is not self.items:
+            self.entries = sorted(
+                (item['name'].casefold(), item['id']) for item in items
+            )
+            self.items = items
+        return self.entries
+
+    def search(self, query, limit):
+        entries = self.get_entries()
+        query = query.casefold()
+        ids = []
+        position = bisect_left(entries, (query, ))
+        while (
+            position < len(entries)
+            and len(ids) < limit
+            and entries[position][0].startswith(query)
+        ):
+            ids.append(entries[position][1])
+            position += 1
+        if len(ids) < limit:
+            for name, id in entries:
+                if query in name and not name.startswith(query):
+                    ids.append(id)
+                    if len(ids) >= limit:
+                        break
+        return ids
+
+
+ingredient_index = IngredientIndex()
+
+
+def search_in_database(queryset, query, limit):
+    ingredients = list(
+        queryset.filter(name__istartswith=query).order_by('name')[:limit]
+    )
+    if len(ingredients) < limit:
+        ingredients += queryset.filter(
+            name__icontains=query
+        ).exclude(
+            name__istartswith=query
+        ).order_by('name')[:limit - len(ingredients)]
+    return ingredients
+
+
+def search_in_memory(queryset, query, limit):
+    return [
+        Ingredient(**ingredient_reference.get(id))
+        for id in ingredient_index.search(query, limit)
+    ]
+
+
+class IngredientSearchFilter(BaseFilterBackend):
+    search_param = api_settings.SEARCH_PARAM
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query or view.action != 'list':
+            return queryset
+        limit = settings.INGREDIENT_SEARCH_LIMIT
+        if connections[queryset.db].vendor == 'postgresql':
+            return search_in_database(queryset, query, limit)
+        return search_in_memory(queryset, query, limit)
+
+
+def recipe_search_vector():
+    config = settings.RECIPE_SEARCH_CONFIG
+    return (
+        SearchVector('name', weight='A', config=config)
+        + SearchVector('text', weight='B', config=config)
+    )
+
+
+def tokenize(text):
+    return re.findall(r'\w+', text.casefold())
+
+
+class RecipeIndex:
+    weights = (('name', 2.0), ('text', 1.0))
+
+    def __init__(self):
+        self.lock = Lock()
+        self.postings = None
+        self.documents = {}
+        self.version = None
+        self.checked = None
+
+    def index_document(self, pk, fields):
+        terms = defaultdict(float)
+        for field, weight in self.weights:
+            for token in tokenize(fields[field]):
+                terms[token] += weight
+        for token, weight in terms.items():
+            self.postings[token][pk] = weight
+        self.documents[pk] = tuple(terms)
+
+    def remove_document(self, pk):
+        for token in self.documents.pop(pk, ()):
+            postings = self.postings[token]
+            postings.pop(pk, None)
+            if not postings:
+                del self.postings[token]
+
+    def check_version(self):
+        now = time.monotonic()
+        if (
+            self.checked is not None
+            and now - self.checked < settings.REFERENCE_CACHE_CHECK_INTERVAL
+        ):
+            return
+        version = get_versions().get(LIST_VERSION_KEY)
+        with self.lock:
+            if version != self.version:
+                self.postings = None
+                self.documents = {}
+                self.version = version
+            self.checked = now
+
+    def get_postings(self):
+        self.check_version()
+        if self.postings is None:
+            with self.lock:
+                if self.postings is None:
+                    self.postings = defaultdict(dict)
+                    self.documents = {}
+                    for recipe in Recipe.objects.values(
+                        'id', 'name', 'text'
+                    ).iterator():
+                        self.index_document(recipe['id'], recipe)
+        return self.postings
+
+    def add(self, recipe):
+        if self.postings is None:
+            return
+        with self.lock:
+            self.remove_document(recipe.pk)
+            self.index_document(
+                recipe.pk,
+                {'name': recipe.name, 'text': recipe.text},
+            )
+
+    def remove(self, pk):
+        if self.postings is None:
+            return
+        with self.lock:
+            self.remove_document(pk)
+
+    def reset(self):
+        with self.lock:
+            self.postings = None
+            self.documents = {}
+
+    def search(self, query, limit):
+        postings = self.get_postings()
+        matches = [postings.get(token) for token in set(tokenize(query))]
+        if not matches or not all(matches):
+            return []
+        matches.sort(key=len)
+        candidates = set(matches[0]).intersection(*matches[1:])
+        total = len(self.documents)
+        idf = [math.log(1 + total / len(match)) for match in matches]
+        scores = {
+            pk: sum(
+                match[pk] * weight for match, weight in zip(matches, idf)
+            )
+            for pk in candidates
+        }
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+        return ranked[:limit]
+
+
+recipe_index = RecipeIndex()
+
+
+def search_recipes(queryset, query):
+    if connections[queryset.db].vendor == 'postgresql':
+        search_query = SearchQuery(
+            query,
+            config=settings.RECIPE_SEARCH_CONFIG,
+        )
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-search_rank', '-pub_date', 'id')
+    ranked = recipe_index.search(query, settings.RECIPE_SEARCH_LIMIT)
+    if not ranked:
+        return queryset.none()
+    tiers = defaultdict(list)
+    for pk, score in ranked:
+        tiers[score].append(pk)
+    return queryset.filter(pk__in=[pk for pk, _ in ranked]).annotate(
+        search_rank=Case(
+            *(When(pk__in=pks, then=Value(score))
+              for score, pks in tiers.items()),
+            output_field=FloatField(),
+        )
+    ).order_by('-search_rank', '-pub_date', 'id')
+
+
+def rebuild_recipe_search(using='default'):
+    if connections[using].vendor == 'postgresql':
+        return Recipe.objects.using(using).update(
+            search_vector=recipe_search_vector()
+        )
+    recipe_index.reset()
+    recipe_index.get_postings()
+    return len(recipe_index.documents)
@@ -1,15 +1,19 @@
-import base64
+from collections import OrderedDict, defaultdict
 
-from django.core.files.base import ContentFile
-from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import Manager
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 from rest_framework.settings import api_settings
 
 from backend.settings import ALLOWED_HOSTS
 
+from .images import decode_base64_image, schedule_thumbnail
 from .models import (Favorited, Follow, Ingredient, IngredientRecipe, Recipe,
                      ShoppingCart, Tag, User)
+from .reference import ingredient_reference, tag_reference
+from .response_cache import render_recipes
+from .shopping_list import change_recipe
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
@@ -28,11 +32,12 @@ class CustomUserSerializer(UserSerializer):
                   'last_name', 'is_subscribed')
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context.get('request', None).user
         if user.is_anonymous:
             return False
-        author = get_object_or_404(User, username=obj.username)
-        return Follow.objects.filter(user=user, author=author).exists()
+        return Follow.objects.filter(user=user, author=obj).exists()
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -41,6 +46,12 @@ class TagSerializer(serializers.ModelSerializer):
         model = Tag
         fields = ('id', 'name', 'color', 'slug', )
 
+    def to_representation(self, instance):
+        return (
+            tag_reference.get(instance.pk)
+            or super().to_representation(instance)
+        )
+
 
 class IngredientSerializer(serializers.ModelSerializer):
 
@@ -66,13 +77,25 @@ class IngredientRecipeSerializer(serializers.ModelSerializer):
         model = IngredientRecipe
         fields = ['id', 'name', 'measurement_unit', 'amount']
 
+    def to_representation(self, instance):
+        ingredient = ingredient_reference.get(instance.ingredient_id)
+        if ingredient is None:
+            return super().to_representation(instance)
+        return OrderedDict((
+            ('id', str(ingredient['id'])),
+            ('name', ingredient['name']),
+            ('measurement_unit', ingredient['measurement_unit']),
+            ('amount', instance.amount),
+        ))
+
 
 class Base64ImageField(serializers.ImageField):
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            return serializers.FileField.to_internal_value(
+                self,
+                decode_base64_image(data),
+            )
         return super().to_internal_value(data)
 
     def to_representation(self, value):
@@ -93,6 +116,19 @@ class Base64ImageField(serializers.ImageField):
         return value.name
 
 
+class ThumbnailImageField(Base64ImageField):
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('source', '*')
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        return super().to_representation(
+            recipe.image_thumbnail or recipe.image
+        )
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     ingredients = IngredientRecipeSerializer(
         many=True,
@@ -104,44 +140,115 @@ class RecipeSerializer(serializers.ModelSerializer):
         fields = ('tags', 'ingredients', 'name', 'image',
                   'text', 'cooking_time', )
 
+    def validate_ingredients(self, value):
+        amounts = {}
+        for ingredient in value:
+            try:
+                ingredient_id = int(ingredient['ingredient']['id'])
+            except ValueError:
+                raise serializers.ValidationError(
+                    f'Некорректный id ингредиента: '
+                    f'{ingredient["ingredient"]["id"]}'
+                )
+            amounts[ingredient_id] = (
+                amounts.get(ingredient_id, 0) + ingredient['amount']
+            )
+        missing = amounts.keys() - Ingredient.objects.in_bulk(amounts).keys()
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты не найдены: '
+                f'{", ".join(str(id) for id in sorted(missing))}'
+            )
+        return amounts
+
     def create_ingredient_recipe(self, ingredients, recipe):
-        for ingredient in ingredients:
-            amount = ingredient.popitem(last=True)[1]
-            ingredient_id = ingredient.popitem(last=True)[1]['id']
-            ingredient = get_object_or_404(Ingredient, id=ingredient_id)
-            IngredientRecipe.objects.create(
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
                 recipe=recipe,
-                ingredient=ingredient,
+                ingredient_id=ingredient_id,
                 amount=amount,
             )
+            for ingredient_id, amount in ingredients.items()
+        )
+
+    def update_ingredient_recipe(self, ingredients, recipe):
+        current = {}
+        stale = []
+        deltas = defaultdict(int, ingredients)
+        for row in recipe.ingredients.all():
+            deltas[row.ingredient_id] -= row.amount
+            if row.ingredient_id in ingredients and (
+                row.ingredient_id not in current
+            ):
+                current[row.ingredient_id] = row
+            else:
+                stale.append(row.id)
+        if stale:
+            IngredientRecipe.objects.filter(id__in=stale).delete()
+        changed = []
+        for ingredient_id, row in current.items():
+            if row.amount != ingredients[ingredient_id]:
+                row.amount = ingredients[ingredient_id]
+                changed.append(row)
+        if changed:
+            IngredientRecipe.objects.bulk_update(changed, ['amount'])
+        self.create_ingredient_recipe(
+            {
+                ingredient_id: amount
+                for ingredient_id, amount in ingredients.items()
+                if ingredient_id not in current
+            },
+            recipe,
+        )
+        change_recipe(recipe.id, deltas)
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
         self.create_ingredient_recipe(ingredients, recipe)
+        if recipe.image:
+            schedule_thumbnail(recipe.image.name)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         if 'ingredients' in validated_data:
-            IngredientRecipe.objects.filter(recipe=instance).delete()
-            ingredients = validated_data.pop('ingredients')
-            self.create_ingredient_recipe(ingredients, instance)
+            self.update_ingredient_recipe(
+                validated_data.pop('ingredients'),
+                instance,
+            )
         if 'tags' in validated_data:
             instance.tags.set(
                 validated_data.pop('tags')
             )
-        return super().update(
+        if 'image' in validated_data:
+            validated_data['image_thumbnail'] = None
+        instance = super().update(
             instance, validated_data
         )
+        if 'image' in validated_data and instance.image:
+            schedule_thumbnail(instance.image.name)
+        return instance
 
     def to_representation(self, instance):
         return RecipeGetSerializer(
             instance,
-            context={
-                'request': self.context.get('request')
-            }).data
+            context=self.context,
+        ).data
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        recipes = data.all() if isinstance(data, Manager) else data
+        return render_recipes(
+            self.child,
+            list(recipes),
+            self.child.fragment_variant(),
+        )
 
 
 class RecipeGetSerializer(serializers.ModelSerializer):
@@ -152,34 +259,75 @@ class RecipeGetSerializer(serializers.ModelSerializer):
     ingredients = IngredientRecipeSerializer(many=True)
     tags = TagSerializer(many=True)
 
+    user_fields = ('is_favorited', 'is_in_shopping_cart')
+
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients', 'is_favorited',
                   'is_in_shopping_cart', 'name', 'image', 'text',
                   'cooking_time', )
+        list_serializer_class = RecipeListSerializer
+
+    def fragment_variant(self):
+        view = self.context.get('view')
+        if view is not None and view.action in ('list', 'feed'):
+            return 'list'
+        return 'detail'
+
+    def user_flags(self, instance):
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        flags = {
+            name: getattr(self, f'get_{name}')(instance)
+            for name in self.user_fields
+        }
+        for name, value in flags.items():
+            setattr(instance, name, value)
+        is_subscribed = self.fields['author'].get_is_subscribed(
+            instance.author
+        )
+        instance.author.is_subscribed = is_subscribed
+        return flags, is_subscribed
+
+    def shared_representation(self, instance):
+        data = super().to_representation(instance)
+        if self.fragment_variant() == 'list':
+            data['image'] = self.fields['image'].to_representation(
+                instance.image_thumbnail or instance.image
+            )
+        for name in self.user_fields:
+            data[name] = None
+        data['author']['is_subscribed'] = None
+        return data
+
+    def to_representation(self, instance):
+        return render_recipes(self, [instance], self.fragment_variant())[0]
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context.get('request', None).user
         if user.is_anonymous:
             return False
-        recipe = get_object_or_404(Recipe, id=obj.id)
         return Favorited.objects.filter(
             user=user,
-            recipe=recipe,
+            recipe=obj,
         ).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context.get('request', None).user
         if user.is_anonymous:
             return False
-        recipe = get_object_or_404(Recipe, id=obj.id)
         return ShoppingCart.objects.filter(
             user=user,
-            recipe=recipe,
+            recipe=obj,
         ).exists()
 
 
 class RecipeShortSerializer(serializers.ModelSerializer):
+    image = ThumbnailImageField()
 
     class Meta:
         model = Recipe
@@ -202,17 +350,16 @@ class UserSubscribeSerializer(serializers.ModelSerializer):
                             'recipes', 'recipes_count', )
 
     def get_recipes(self, obj):
+        if hasattr(obj, 'limited_recipes'):
+            return RecipeShortSerializer(obj.limited_recipes, many=True).data
         limit = self.context['limit']
-        if limit:
-            limit = int(limit)
-            recipes = Recipe.objects.filter(author=obj.id)[:limit]
-            return RecipeShortSerializer(recipes, many=True).data
         recipes = Recipe.objects.filter(author=obj.id)
+        if limit:
+            recipes = recipes[:int(limit)]
         return RecipeShortSerializer(recipes, many=True).data
 
     def get_is_subscribed(self, obj):
         return True
 
     def get_recipes_count(self, obj):
-        user = get_object_or_404(User, id=obj.id)
-        return Recipe.objects.filter(author=user).count()
+        return obj.recipes_count
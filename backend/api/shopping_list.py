@@ -0,0 +1,128 @@
+from collections import defaultdict
+
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from .models import IngredientRecipe, ShoppingCart, ShoppingListItem, User
+
+
+def recipe_amounts(*recipe_ids):
+    amounts = defaultdict(int)
+    for ingredient_id, amount in IngredientRecipe.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('ingredient_id', 'amount'):
+        amounts[ingredient_id] += amount
+    return amounts
+
+
+def bump_versions(user_ids=None):
+    users = User.objects.all()
+    if user_ids is not None:
+        users = users.filter(id__in=user_ids)
+    users.update(shopping_list_version=F('shopping_list_version') + 1)
+
+
+def apply_deltas(user_ids, deltas):
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items() if delta
+    }
+    if not user_ids or not deltas:
+        return
+    ShoppingListItem.objects.bulk_create(
+        (
+            ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id)
+            for user_id in user_ids
+            for ingredient_id, delta in deltas.items() if delta > 0
+        ),
+        ignore_conflicts=True,
+    )
+    items = ShoppingListItem.objects.filter(
+        user_id__in=user_ids,
+        ingredient_id__in=deltas,
+    )
+    items.update(total_amount=F('total_amount') + Case(
+        *(When(ingredient_id=ingredient_id, then=Value(delta))
+          for ingredient_id, delta in deltas.items()),
+        default=Value(0),
+        output_field=IntegerField(),
+    ))
+    items.filter(total_amount__lte=0).delete()
+    bump_versions(user_ids)
+
+
+def add_recipe(user_id, *recipe_ids):
+    if recipe_ids:
+        apply_deltas([user_id], recipe_amounts(*recipe_ids))
+
+
+def remove_recipe(user_id, *recipe_ids):
+    if recipe_ids:
+        apply_deltas([user_id], {
+            ingredient_id: -amount
+            for ingredient_id, amount in recipe_amounts(*recipe_ids).items()
+        })
+
+
+def change_recipe(recipe_id, deltas):
+    apply_deltas(
+        list(ShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True)),
+        deltas,
+    )
+
+
+def live_totals(user_ids=None):
+    carts = ShoppingCart.objects.all()
+    if user_ids is not None:
+        carts = carts.filter(user_id__in=user_ids)
+    return {
+        (row['user_id'], row['recipe__ingredients__ingredient_id']):
+            row['total']
+        for row in carts.values(
+            'user_id', 'recipe__ingredients__ingredient_id'
+        ).annotate(
+            total=Sum('recipe__ingredients__amount')
+        ).order_by()
+        if row['recipe__ingredients__ingredient_id'] is not None
+    }
+
+
+def stored_totals(user_ids=None):
+    items = ShoppingListItem.objects.all()
+    if user_ids is not None:
+        items = items.filter(user_id__in=user_ids)
+    return {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in items.values_list(
+            'user_id', 'ingredient_id', 'total_amount'
+        )
+    }
+
+
+def find_inconsistent_users(user_ids=None):
+    live = live_totals(user_ids)
+    stored = stored_totals(user_ids)
+    return sorted({
+        user_id
+        for user_id, ingredient_id in live.keys() | stored.keys()
+        if live.get((user_id, ingredient_id)) != stored.get(
+            (user_id, ingredient_id)
+        )
+    })
+
+
+def rebuild(user_ids=None):
+    items = ShoppingListItem.objects.all()
+    if user_ids is not None:
+        items = items.filter(user_id__in=user_ids)
+    items.delete()
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(
+            user_id=user_id,
+            ingredient_id=ingredient_id,
+            total_amount=total,
+        )
+        for (user_id, ingredient_id), total in live_totals(user_ids).items()
+    )
+    bump_versions(user_ids)
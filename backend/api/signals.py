@@ -0,0 +1,235 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.signals import request_started
+from django.db import connections
+from django.db.models.signals import (m2m_changed, post_delete, post_migrate,
+                                      post_save, pre_delete)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_tokens
+from .backfills import run_backfills
+from .conditional import invalidate_user_state, invalidate_users
+from .counters import update_counters
+from .feed import follow_authors, schedule_fan_out, unfollow_authors
+from .models import (Favorited, Follow, Ingredient, IngredientRecipe, Recipe,
+                     ShoppingCart, ShoppingListItem, Tag, User)
+from .reference import ingredient_reference, tag_reference
+from .response_cache import invalidate_recipes
+from .scores import update_scores
+from .search import recipe_index, recipe_search_vector
+from .shopping_list import add_recipe, bump_versions, remove_recipe
+
+SEARCH_INDEXES = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS api_ingredient_name_prefix_idx '
+    'ON api_ingredient (UPPER(name::text) text_pattern_ops)',
+    'CREATE INDEX IF NOT EXISTS api_ingredient_name_trgm_idx '
+    'ON api_ingredient USING gin (UPPER(name::text) gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS api_recipe_search_vector_idx '
+    'ON api_recipe USING gin (search_vector)',
+)
+
+
+@receiver(post_migrate)
+def create_search_indexes(sender, using, **kwargs):
+    if sender.name != 'api' or connections[using].vendor != 'postgresql':
+        return
+    with connections[using].cursor() as cursor:
+        for sql in SEARCH_INDEXES:
+            cursor.execute(sql)
+
+
+@receiver(post_migrate)
+def create_cache_table(sender, using, verbosity, **kwargs):
+    if sender.name == 'api':
+        call_command('createcachetable', database=using, verbosity=verbosity)
+
+
+@receiver(post_migrate)
+def backfill_denormalized_data(sender, using, **kwargs):
+    if sender.name == 'api' and using == 'default':
+        run_backfills()
+
+
+@receiver(request_started)
+def close_unusable_connections(**kwargs):
+    if not settings.DB_CONN_HEALTH_CHECKS:
+        return
+    for connection in connections.all():
+        if connection.connection is not None and not connection.is_usable():
+            connection.close()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tag_reference(**kwargs):
+    tag_reference.bump()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_ingredient_reference(**kwargs):
+    ingredient_reference.bump()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def bump_ingredient_shopping_lists(instance, **kwargs):
+    if kwargs.get('created'):
+        return
+    bump_versions(ShoppingListItem.objects.filter(
+        ingredient=instance,
+    ).values('user_id'))
+
+
+@receiver(post_save, sender=Favorited)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Follow)
+@receiver(post_save, sender=Recipe)
+def increment_counters(instance, created, **kwargs):
+    if created:
+        update_counters(instance, 1)
+
+
+@receiver(post_delete, sender=Favorited)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Follow)
+@receiver(post_delete, sender=Recipe)
+def decrement_counters(instance, **kwargs):
+    update_counters(instance, -1)
+
+
+@receiver(post_save, sender=Favorited)
+@receiver(post_save, sender=ShoppingCart)
+def increase_recipe_scores(instance, created, **kwargs):
+    if created:
+        update_scores(type(instance), [instance.recipe_id], 1)
+
+
+@receiver(post_delete, sender=Favorited)
+@receiver(post_delete, sender=ShoppingCart)
+def decrease_recipe_scores(instance, **kwargs):
+    update_scores(type(instance), [instance.recipe_id], -1)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(instance, created, **kwargs):
+    if created:
+        add_recipe(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(instance, **kwargs):
+    remove_recipe(instance.user_id, instance.recipe_id)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(instance, created, **kwargs):
+    if created:
+        schedule_fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(instance, created, **kwargs):
+    if created:
+        follow_authors(instance.user_id, [instance.author_id])
+
+
+@receiver(post_delete, sender=Follow)
+def clear_feed(instance, **kwargs):
+    unfollow_authors(instance.user_id, [instance.author_id])
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search(instance, using, **kwargs):
+    if connections[using].vendor == 'postgresql':
+        Recipe.objects.using(using).filter(pk=instance.pk).update(
+            search_vector=recipe_search_vector()
+        )
+    else:
+        recipe_index.add(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_recipe_search(instance, using, **kwargs):
+    if connections[using].vendor != 'postgresql':
+        recipe_index.remove(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_responses(instance, **kwargs):
+    invalidate_recipes([instance.pk])
+
+
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def invalidate_ingredient_recipe_responses(instance, **kwargs):
+    invalidate_recipes([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tag_responses(instance, action, reverse, pk_set,
+                                    **kwargs):
+    if reverse and action == 'pre_clear':
+        invalidate_recipes(instance.recipe_set.values_list('id', flat=True))
+    elif not action.startswith('post_'):
+        return
+    elif not reverse:
+        invalidate_recipes([instance.pk])
+    elif pk_set:
+        invalidate_recipes(pk_set)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_responses(instance, created, update_fields, **kwargs):
+    if created or (
+        update_fields is not None
+        and set(update_fields) <= {'last_login', 'password'}
+    ):
+        return
+    invalidate_recipes(
+        instance.recipes.values_list('id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(instance, **kwargs):
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(instance, created, update_fields, **kwargs):
+    if created or (
+        update_fields is not None and set(update_fields) <= {'last_login'}
+    ):
+        return
+    invalidate_tokens(
+        Token.objects.filter(user=instance).values_list('key', flat=True)
+    )
+
+
+@receiver(post_save, sender=Favorited)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Favorited)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Follow)
+def invalidate_user_state_responses(instance, **kwargs):
+    invalidate_user_state([instance.user_id])
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_responses(instance, update_fields, **kwargs):
+    if (
+        update_fields is not None
+        and set(update_fields) <= {'last_login', 'password'}
+    ):
+        return
+    invalidate_users([instance.pk])
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_user_responses(instance, **kwargs):
+    invalidate_users([instance.pk])
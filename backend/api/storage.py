@@ -0,0 +1,20 @@
+import os
+from uuid import uuid4
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        if self.exists(name):
+            return name
+        temp_name = super()._save(f'{name}.{uuid4().hex}.tmp', content)
+        os.replace(self.path(temp_name), self.path(name))
+        return name
+
+
+content_storage = ContentAddressedStorage()
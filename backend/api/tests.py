@@ -0,0 +1,699 @@
+import json
+import os
+from base64 import b64encode
+from concurrent.futures.process import BrokenProcessPool
+from hashlib import md5
+from tempfile import TemporaryDirectory
+from threading import Barrier, Thread
+
+from django.conf import settings
+from django.db import connection, connections
+from django.test import (TransactionTestCase, override_settings,
+                         skipUnlessDBFeature)
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from .counters import COUNTERS, recount
+from .export_cache import get_executor
+from .feed import rebuild_feeds
+from .instrumentation import stats as instrumentation_stats
+from .management.benchmark import make_client, reset_caches
+from .models import (Favorited, FeedEntry, Follow, Ingredient,
+                     IngredientRecipe, Recipe, ShoppingCart, ShoppingListItem,
+                     Tag, User)
+from .response_cache import LIST_VERSION_KEY, get_cache, get_versions
+from .shopping_list import find_inconsistent_users
+from .shopping_list import rebuild as rebuild_shopping_lists
+
+PAGE_SIZES = (2, 6)
+
+
+def create_user(name):
+    return User.objects.create_user(
+        username=name,
+        email=f'{name}@example.com',
+        password='password',
+    )
+
+
+def create_recipe(author, ingredients, tags=(), amount=1, name='Рецепт'):
+    recipe = Recipe.objects.create(
+        author=author,
+        name=name,
+        text='Описание',
+        cooking_time=10,
+        image='recipes/images/recipe.png',
+    )
+    recipe.tags.set(tags)
+    IngredientRecipe.objects.bulk_create(
+        IngredientRecipe(recipe=recipe, ingredient=ingredient, amount=amount)
+        for ingredient in ingredients
+    )
+    return recipe
+
+
+def use_temporary_export_cache(test):
+    directory = TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    settings_override = test.settings(SHOPPING_LIST_CACHE_DIR=directory.name)
+    settings_override.enable()
+    test.addCleanup(settings_override.disable)
+
+
+def create_ingredients(count):
+    return [
+        Ingredient.objects.create(name=f'Продукт {number}',
+                                  measurement_unit='г')
+        for number in range(count)
+    ]
+
+
+@override_settings(
+    REFERENCE_CACHE_CHECK_INTERVAL=3600,
+    RECIPE_RESPONSE_CACHE_METRICS_INTERVAL=3600,
+)
+class RecipeListQueryCountTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        tags = [
+            Tag.objects.create(name=f'Тег {number}', color='#000000',
+                               slug=f'tag-{number}')
+            for number in range(2)
+        ]
+        ingredients = create_ingredients(3)
+        cls.reader = create_user('reader')
+        authors = [create_user(f'author{number}') for number in range(3)]
+        for number in range(max(PAGE_SIZES) + 1):
+            recipe = create_recipe(
+                authors[number % len(authors)],
+                ingredients,
+                tags[:1 + number % len(tags)],
+                amount=number + 1,
+                name=f'Рецепт {number}',
+            )
+            if number % 2:
+                Favorited.objects.create(user=cls.reader, recipe=recipe)
+                ShoppingCart.objects.create(user=cls.reader, recipe=recipe)
+        Follow.objects.create(user=cls.reader, author=authors[0])
+
+    def get_recipes(self, client, limit):
+        response = client.get('/api/recipes/', {'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), limit)
+        return response
+
+    def assert_cold_queries(self, user, expected):
+        client = make_client(user)
+        for limit in PAGE_SIZES:
+            reset_caches()
+            with CaptureQueriesContext(connection) as captured:
+                self.get_recipes(client, limit)
+            self.assertEqual(len(captured), expected, '\n'.join(
+                query['sql'] for query in captured
+            ))
+
+    def assert_warm_queries(self, user, expected):
+        client = make_client(user)
+        for limit in PAGE_SIZES:
+            reset_caches()
+            self.get_recipes(client, limit)
+            with self.assertNumQueries(expected):
+                self.get_recipes(client, limit)
+
+    def test_anonymous_cold(self):
+        self.assert_cold_queries(None, 19)
+
+    def test_authenticated_cold(self):
+        self.assert_cold_queries(self.reader, 16)
+
+    def test_anonymous_warm(self):
+        self.assert_warm_queries(None, 2)
+
+    def test_authenticated_warm(self):
+        self.assert_warm_queries(self.reader, 4)
+
+    def test_flags(self):
+        response = self.get_recipes(make_client(self.reader), max(PAGE_SIZES))
+        for recipe in response.data['results']:
+            expected = Favorited.objects.filter(
+                user=self.reader,
+                recipe_id=recipe['id'],
+            ).exists()
+            self.assertEqual(recipe['is_favorited'], expected)
+            self.assertEqual(recipe['is_in_shopping_cart'], expected)
+            self.assertEqual(
+                recipe['author']['is_subscribed'],
+                recipe['author']['username'] == 'author0',
+            )
+
+
+@override_settings(
+    REFERENCE_CACHE_CHECK_INTERVAL=3600,
+    RECIPE_RESPONSE_CACHE_METRICS_INTERVAL=3600,
+)
+class ReplicaReadTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        cls.recipe = create_recipe(create_user('author'),
+                                   create_ingredients(1))
+
+    def test_no_pin_lookup_without_replicas(self):
+        client = make_client(self.reader)
+        client.get('/api/tags/')
+        with self.assertNumQueries(0):
+            self.assertEqual(client.get('/api/tags/').status_code, 200)
+        with CaptureQueriesContext(connection) as captured:
+            response = client.post(f'/api/recipes/{self.recipe.pk}/favorite/')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse([
+            query for query in captured if 'db:pin' in query['sql']
+        ])
+
+    @override_settings(DB_REPLICAS=['default'])
+    def test_replica_reads_are_not_cached(self):
+        client = make_client()
+        reset_caches()
+        for _ in range(2):
+            response = client.get('/api/recipes/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['X-Cache'], 'MISS')
+            self.assertFalse(response.has_header('ETag'))
+        with self.settings(DB_REPLICAS=[]):
+            client.get('/api/recipes/')
+            response = client.get('/api/recipes/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertTrue(response.has_header('ETag'))
+
+
+@override_settings(
+    REFERENCE_CACHE_CHECK_INTERVAL=3600,
+    RECIPE_RESPONSE_CACHE_METRICS_INTERVAL=3600,
+)
+class StaleResponseTests(APITestCase):
+
+    def test_stale_hit_has_no_validators(self):
+        recipe = create_recipe(create_user('author'), create_ingredients(1))
+        client = make_client()
+        reset_caches()
+        self.assertEqual(client.get('/api/recipes/')['X-Cache'], 'MISS')
+        Recipe.objects.filter(pk=recipe.pk).update(name='Новое название')
+        get_versions().bump_many([LIST_VERSION_KEY])
+        key = md5(f'{settings.ALLOWED_HOSTS[0]}:list:'.encode()).hexdigest()
+        get_cache().add(f'recipes:response:{key}:lock', True)
+        response = client.get('/api/recipes/')
+        self.assertEqual(response['X-Cache'], 'STALE')
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Cache-Control'))
+
+
+@override_settings(
+    API_INSTRUMENTATION=True,
+    API_QUERY_BUDGET_MODE='raise',
+    REFERENCE_CACHE_CHECK_INTERVAL=3600,
+    RECIPE_RESPONSE_CACHE_METRICS_INTERVAL=3600,
+)
+class QueryBudgetTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        tag = Tag.objects.create(name='Тег', color='#000000', slug='tag')
+        ingredients = create_ingredients(3)
+        cls.reader = create_user('reader')
+        authors = [create_user(f'author{number}') for number in range(3)]
+        for number in range(12):
+            recipe = create_recipe(authors[number % len(authors)],
+                                   ingredients, [tag])
+            Favorited.objects.create(user=cls.reader, recipe=recipe)
+            ShoppingCart.objects.create(user=cls.reader, recipe=recipe)
+        for author in authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        rebuild_feeds()
+        rebuild_shopping_lists()
+        cls.recipe = recipe
+        cls.token = Token.objects.create(user=cls.reader)
+
+    def setUp(self):
+        use_temporary_export_cache(self)
+
+    def paths(self):
+        return {
+            'recipes-list': (
+                '/api/recipes/',
+                '/api/recipes/?page=2&limit=6',
+                '/api/recipes/?is_in_shopping_cart=1&tags=tag',
+            ),
+            'recipes-detail': (f'/api/recipes/{self.recipe.pk}/', ),
+            'recipes-feed': ('/api/recipes/feed/', ),
+            'tags-list': ('/api/tags/', ),
+            'ingredients-list': ('/api/ingredients/?name=Продукт', ),
+            'users-me': ('/api/users/me/', ),
+            'api/users/subscriptions/': (
+                '/api/users/subscriptions/?recipes_limit=2',
+            ),
+            'api/recipes/download_shopping_cart/': (
+                '/api/recipes/download_shopping_cart/?format=txt',
+            ),
+        }
+
+    def test_budgets_cover_every_endpoint(self):
+        self.assertEqual(set(self.paths()), set(settings.API_QUERY_BUDGETS))
+
+    def test_budgets_hold_cold_and_warm(self):
+        anonymous = make_client()
+        authenticated = make_client()
+        authenticated.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+        instrumentation_stats.clear()
+        for name, paths in self.paths().items():
+            for path in paths:
+                for client in (anonymous, authenticated):
+                    reset_caches(self.reader)
+                    for attempt in ('cold', 'warm'):
+                        with self.subTest(path=path, attempt=attempt,
+                                          client=client is authenticated):
+                            response = client.get(path)
+                            self.assertIn(response.status_code, (200, 401))
+        self.assertEqual(sum(
+            values['n_plus_one_total']
+            for values in instrumentation_stats.values()
+        ), 0)
+
+
+@override_settings(SHOPPING_LIST_RENDER_WORKERS=2)
+class ShoppingListRenderTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        recipe = create_recipe(create_user('author'), create_ingredients(2))
+        ShoppingCart.objects.create(user=cls.reader, recipe=recipe)
+        rebuild_shopping_lists()
+
+    def setUp(self):
+        use_temporary_export_cache(self)
+        self.client = make_client(self.reader)
+
+    def download(self):
+        return self.client.get('/api/recipes/download_shopping_cart/',
+                               {'format': 'pdf'})
+
+    def test_export_formats(self):
+        path = '/api/recipes/download_shopping_cart/'
+        for export_format in ('pdf', 'txt', 'csv'):
+            with self.subTest(format=export_format):
+                response = self.client.get(path, {'format': export_format})
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(f'shopping_cart.{export_format}',
+                              response['Content-Disposition'])
+        response = self.client.get(path, {'format': 'json'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_format_override_elsewhere(self):
+        response = self.client.get('/api/tags/', {'format': 'json'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        response = self.client.get('/api/tags/', {'format': 'pdf'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_timeout_returns_503(self):
+        with self.settings(SHOPPING_LIST_RENDER_TIMEOUT=0.001):
+            response = self.download()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'],
+                         str(settings.SHOPPING_LIST_RENDER_RETRY_AFTER))
+
+    def test_broken_pool_is_replaced(self):
+        broken = get_executor()
+        with self.assertRaises(BrokenProcessPool):
+            broken.submit(os._exit, 1).result()
+        response = self.download()
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+        self.assertIsNot(get_executor(), broken)
+        response = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content))
+
+
+class BatchTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        ingredients = create_ingredients(1)
+        author = create_user('author')
+        cls.recipes = [
+            create_recipe(author, ingredients, name=f'Рецепт {number}')
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        self.client = make_client(self.reader)
+
+    def batch(self, method, ids):
+        response = getattr(self.client, method)(
+            '/api/recipes/favorite/', {'ids': ids}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        return {
+            item['id']: item['status'] for item in response.data['results']
+        }
+
+    def assert_favorites(self, *counts):
+        for recipe, count in zip(self.recipes, counts):
+            recipe.refresh_from_db()
+            self.assertEqual(recipe.favorites_count, count)
+            self.assertEqual(
+                Favorited.objects.filter(recipe=recipe).count(), count,
+            )
+
+    def test_statuses(self):
+        first, second, third = (recipe.pk for recipe in self.recipes)
+        missing = max(first, second, third) + 1
+        self.assertEqual(self.batch('post', [first]), {first: 'created'})
+        self.assertEqual(
+            self.batch('post', [first, second, second, 'abc', missing]),
+            {first: 'exists', second: 'created', 'abc': 'invalid',
+             missing: 'not_found'},
+        )
+        self.assert_favorites(1, 1, 0)
+        self.assertEqual(
+            self.batch('delete', [first, third]),
+            {first: 'deleted', third: 'missing'},
+        )
+        self.assert_favorites(0, 1, 0)
+
+    def test_out_of_range_ids(self):
+        for item in (str(2 ** 63), '1000000000000000000000000000000'):
+            with self.subTest(item=item):
+                response = self.client.post(
+                    '/api/recipes/favorite/', {'ids': [item]}, format='json',
+                )
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            self.batch('post', [str(2 ** 63 - 1)]),
+            {2 ** 63 - 1: 'not_found'},
+        )
+
+    def test_batch_and_single_writes(self):
+        recipe = self.recipes[0]
+        path = f'/api/recipes/{recipe.pk}/favorite/'
+        self.assertEqual(self.client.post(path).status_code, 201)
+        self.assertEqual(self.batch('post', [recipe.pk]),
+                         {recipe.pk: 'exists'})
+        self.assertEqual(self.client.post(path).status_code, 400)
+        self.assert_favorites(1)
+        self.assertEqual(self.batch('delete', [recipe.pk]),
+                         {recipe.pk: 'deleted'})
+        self.assertEqual(self.client.delete(path).status_code, 204)
+        self.assert_favorites(0)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class BatchConcurrencyTests(TransactionTestCase):
+
+    def test_batch_races_single_write(self):
+        reader = create_user('reader')
+        ingredients = create_ingredients(1)
+        author = create_user('author')
+        recipes = [
+            create_recipe(author, ingredients, name=f'Рецепт {number}')
+            for number in range(3)
+        ]
+        target = recipes[1]
+        for _ in range(5):
+            barrier = Barrier(2)
+            responses = {}
+
+            def request(name, method, *args, **kwargs):
+                try:
+                    barrier.wait()
+                    responses[name] = getattr(make_client(reader), method)(
+                        *args, **kwargs
+                    )
+                finally:
+                    connections.close_all()
+
+            threads = [
+                Thread(target=request, args=(
+                    'batch', 'post', '/api/recipes/favorite/',
+                    {'ids': [recipe.pk for recipe in recipes]},
+                ), kwargs={'format': 'json'}),
+                Thread(target=request, args=(
+                    'single', 'post', f'/api/recipes/{target.pk}/favorite/',
+                )),
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            statuses = {
+                item['id']: item['status']
+                for item in responses['batch'].data['results']
+            }
+            self.assertNotEqual(
+                statuses[target.pk] == 'created',
+                responses['single'].status_code == 201,
+            )
+            for recipe in recipes:
+                recipe.refresh_from_db()
+                self.assertEqual(recipe.favorites_count, 1)
+            Favorited.objects.filter(user=reader).delete()
+
+
+@override_settings(REFERENCE_CACHE_CHECK_INTERVAL=0)
+class RecipeSearchIndexTests(APITestCase):
+
+    def search(self, query):
+        response = make_client().get('/api/recipes/',
+                                     {'search': query, 'limit': 10})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_index_follows_version_changes(self):
+        recipe = create_recipe(create_user('author'), create_ingredients(1),
+                               name='Борщ')
+        self.assertEqual(self.search('борщ'), [recipe.pk])
+        Recipe.objects.filter(pk=recipe.pk).update(name='Солянка')
+        self.assertEqual(self.search('солянка'), [])
+        get_versions().bump(LIST_VERSION_KEY)
+        self.assertEqual(self.search('солянка'), [recipe.pk])
+        self.assertEqual(self.search('борщ'), [])
+
+
+class CounterTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        cls.author = create_user('author')
+        cls.ingredients = create_ingredients(1)
+        cls.recipe = create_recipe(cls.author, cls.ingredients)
+
+    def setUp(self):
+        self.client = make_client(self.reader)
+
+    def assert_counts(self, instance, **counts):
+        instance.refresh_from_db()
+        for field, count in counts.items():
+            self.assertEqual(getattr(instance, field), count, field)
+        for counter in COUNTERS:
+            self.assertEqual(recount(*counter), 0, counter[1])
+
+    def test_favorites_and_shopping_cart(self):
+        for relation, field in (('favorite', 'favorites_count'),
+                                ('shopping_cart', 'shopping_cart_count')):
+            with self.subTest(relation=relation):
+                path = f'/api/recipes/{self.recipe.pk}/{relation}/'
+                self.client.post(path)
+                self.assert_counts(self.recipe, **{field: 1})
+                self.client.post(path)
+                self.assert_counts(self.recipe, **{field: 1})
+                self.client.delete(path)
+                self.assert_counts(self.recipe, **{field: 0})
+                batch = f'/api/recipes/{relation}/'
+                ids = {'ids': [self.recipe.pk]}
+                self.client.post(batch, ids, format='json')
+                self.assert_counts(self.recipe, **{field: 1})
+                self.client.delete(batch, ids, format='json')
+                self.assert_counts(self.recipe, **{field: 0})
+
+    def test_followers(self):
+        path = f'/api/users/{self.author.pk}/subscribe/'
+        self.client.post(path)
+        self.assert_counts(self.author, followers_count=1)
+        self.client.delete(path)
+        self.assert_counts(self.author, followers_count=0)
+        ids = {'ids': [self.author.pk]}
+        self.client.post('/api/users/subscribe/', ids, format='json')
+        self.assert_counts(self.author, followers_count=1)
+        self.client.delete('/api/users/subscribe/', ids, format='json')
+        self.assert_counts(self.author, followers_count=0)
+
+    def test_recipes(self):
+        self.assert_counts(self.author, recipes_count=1)
+        recipe = create_recipe(self.author, self.ingredients)
+        self.assert_counts(self.author, recipes_count=2)
+        self.client.post(f'/api/recipes/{recipe.pk}/favorite/')
+        response = make_client(self.author).delete(
+            f'/api/recipes/{recipe.pk}/'
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assert_counts(self.author, recipes_count=1)
+
+
+class ShoppingListTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.readers = [create_user(f'reader{number}') for number in range(2)]
+        cls.author = create_user('author')
+        cls.ingredients = create_ingredients(3)
+        cls.soup = create_recipe(cls.author, cls.ingredients[:2], amount=2)
+        cls.salad = create_recipe(cls.author, cls.ingredients[:1], amount=5)
+
+    def assert_totals(self, user, *totals):
+        self.assertEqual(dict(ShoppingListItem.objects.filter(
+            user=user,
+        ).values_list('ingredient_id', 'total_amount')), {
+            self.ingredients[index].pk: total
+            for index, total in enumerate(totals) if total
+        })
+        self.assertEqual(find_inconsistent_users(), [])
+
+    def edit_ingredients(self, recipe, amounts):
+        response = make_client(self.author).patch(
+            f'/api/recipes/{recipe.pk}/',
+            {'ingredients': [
+                {'id': self.ingredients[index].pk, 'amount': amount}
+                for index, amount in amounts.items()
+            ]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_cart_changes(self):
+        reader = self.readers[0]
+        client = make_client(reader)
+        client.post(f'/api/recipes/{self.soup.pk}/shopping_cart/')
+        self.assert_totals(reader, 2, 2)
+        client.post('/api/recipes/shopping_cart/',
+                    {'ids': [self.soup.pk, self.salad.pk]}, format='json')
+        self.assert_totals(reader, 7, 2)
+        client.delete(f'/api/recipes/{self.soup.pk}/shopping_cart/')
+        self.assert_totals(reader, 5)
+        client.delete('/api/recipes/shopping_cart/',
+                      {'ids': [self.salad.pk]}, format='json')
+        self.assert_totals(reader)
+
+    def test_recipe_changes(self):
+        for reader in self.readers:
+            make_client(reader).post('/api/recipes/shopping_cart/',
+                                     {'ids': [self.soup.pk, self.salad.pk]},
+                                     format='json')
+        self.edit_ingredients(self.soup, {0: 4, 2: 1})
+        for reader in self.readers:
+            self.assert_totals(reader, 9, 0, 1)
+        self.edit_ingredients(self.salad, {1: 3})
+        for reader in self.readers:
+            self.assert_totals(reader, 4, 3, 1)
+        make_client(self.author).delete(f'/api/recipes/{self.soup.pk}/')
+        for reader in self.readers:
+            self.assert_totals(reader, 0, 3)
+
+
+class FeedTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        cls.authors = [create_user(f'author{number}') for number in range(2)]
+        cls.ingredients = create_ingredients(1)
+        cls.recipes = [
+            create_recipe(author, cls.ingredients)
+            for author in cls.authors
+        ]
+
+    def setUp(self):
+        self.client = make_client(self.reader)
+
+    def assert_feed(self, *recipes):
+        expected = sorted(recipe.pk for recipe in recipes)
+        self.assertEqual(sorted(FeedEntry.objects.filter(
+            user=self.reader,
+        ).values_list('recipe_id', flat=True)), expected)
+        response = self.client.get('/api/recipes/feed/', {'limit': 10})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(recipe['id'] for recipe in response.data['results']),
+            expected,
+        )
+
+    def test_follow_and_unfollow(self):
+        first, second = self.authors
+        self.client.post(f'/api/users/{first.pk}/subscribe/')
+        self.assert_feed(self.recipes[0])
+        self.client.post('/api/users/subscribe/', {'ids': [second.pk]},
+                         format='json')
+        self.assert_feed(*self.recipes)
+        self.client.delete(f'/api/users/{first.pk}/subscribe/')
+        self.assert_feed(self.recipes[1])
+        self.client.delete('/api/users/subscribe/', {'ids': [second.pk]},
+                           format='json')
+        self.assert_feed()
+
+    def test_recipe_changes(self):
+        author = self.authors[0]
+        self.client.post(f'/api/users/{author.pk}/subscribe/')
+        recipe = create_recipe(author, self.ingredients)
+        create_recipe(self.authors[1], self.ingredients)
+        self.assert_feed(self.recipes[0], recipe)
+        response = make_client(author).delete(f'/api/recipes/{recipe.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assert_feed(self.recipes[0])
+
+
+def encode_cursor(values):
+    return b64encode(json.dumps(values).encode()).decode()
+
+
+class CursorPaginationTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        author = create_user('author')
+        ingredients = create_ingredients(1)
+        for number in range(3):
+            create_recipe(author, ingredients, name=f'Рецепт {number}')
+        Follow.objects.create(user=cls.reader, author=author)
+
+    def test_next_cursor(self):
+        client = make_client()
+        response = client.get('/api/recipes/', {'cursor': '', 'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+        response = client.get(response.data['next'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_malformed_cursors(self):
+        cursors = {
+            'garbage': 'не base64 %%%',
+            'not a list': encode_cursor('xx'),
+            'wrong types': encode_cursor(['nope', 1]),
+            'nested': encode_cursor([{}, []]),
+            'nulls': encode_cursor([None, None]),
+            'wrong length': encode_cursor(['2022-01-01T00:00:00+00:00']),
+        }
+        for path, client in (
+            ('/api/recipes/', make_client()),
+            ('/api/recipes/feed/', make_client(self.reader)),
+        ):
+            for name, cursor in cursors.items():
+                with self.subTest(path=path, cursor=name):
+                    response = client.get(path, {'cursor': cursor})
+                    self.assertEqual(response.status_code, 404)
@@ -1,9 +1,11 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (CustomUserViewSet, GetSubscribeVeiwSet, IngredientViewSet,
-                    RecipeViewSet, TagViewSet, download_shopping_cart,
-                    favorited, shopping_cart, subscribe)
+from .instrumentation import metrics
+from .views import (CustomUserViewSet, DownloadShoppingCartView,
+                    GetSubscribeVeiwSet, IngredientViewSet, RecipeViewSet,
+                    TagViewSet, favorited, favorited_batch, shopping_cart,
+                    shopping_cart_batch, subscribe, subscribe_batch)
 
 router_v1 = DefaultRouter()
 router_v1.register(
@@ -39,7 +41,19 @@ urlpatterns = [
     ),
     path(
         'recipes/download_shopping_cart/',
-        download_shopping_cart,
+        DownloadShoppingCartView.as_view(),
+    ),
+    path(
+        'recipes/favorite/',
+        favorited_batch,
+    ),
+    path(
+        'recipes/shopping_cart/',
+        shopping_cart_batch,
+    ),
+    path(
+        'users/subscribe/',
+        subscribe_batch,
     ),
     path(
         'users/<int:user_id>/subscribe/',
@@ -49,5 +63,6 @@ urlpatterns = [
         'users/subscriptions/',
         GetSubscribeVeiwSet.as_view({'get': 'list'}),
     ),
+    path('metrics/', metrics),
     path('', include(router_v1.urls)),
 ]
@@ -1,29 +1,61 @@
 from django.contrib.auth.tokens import default_token_generator
-from django.db.models import Sum
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef, Prefetch, Subquery
 from django.http import FileResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from djoser import signals
 from djoser.conf import settings
 from rest_framework import status
 from rest_framework.decorators import action, api_view
 from rest_framework.exceptions import NotFound
-from rest_framework.filters import SearchFilter
 from rest_framework.mixins import ListModelMixin
-from rest_framework.permissions import AllowAny
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import APISettings, api_settings
+from rest_framework.views import APIView
 from rest_framework.viewsets import (GenericViewSet, ModelViewSet,
                                      ReadOnlyModelViewSet)
 
-from .create_pdf import create_shopping_cart_pdf
-from .models import (Favorited, Follow, Ingredient, IngredientRecipe, Recipe,
-                     ShoppingCart, Tag, User)
-from .paginations import CustomPagination
+from .batch import (apply_batch, lock_user, shopping_list_created,
+                    subscriptions_created)
+from .conditional import (RecipeConditionalMixin, SubscriptionConditionalMixin,
+                          UserConditionalMixin)
+from .create_pdf import SHOPPING_CART_FORMATS
+from .export_cache import cached_shopping_list, shopping_list_key
+from .feed import feed_sources
+from .filters import RecipeFilterBackend
+from .models import (Favorited, Follow, Ingredient, Recipe, ShoppingCart,
+                     ShoppingListItem, Tag, User)
+from .paginations import (CustomCursorPagination, CustomPagination,
+                          FeedPagination)
+from .reference import ReferenceCacheMixin, ingredient_reference, tag_reference
+from .response_cache import AnonymousResponseCacheMixin
+from .routers import ReplicaReadMixin
+from .scores import SCORE_FIELDS
+from .search import IngredientSearchFilter
 from .serializers import (CustomUserSerializer, IngredientSerializer,
-                          RecipeSerializer, RecipeShortSerializer,
-                          TagSerializer, UserSubscribeSerializer)
+                          RecipeGetSerializer, RecipeSerializer,
+                          RecipeShortSerializer, TagSerializer,
+                          UserSubscribeSerializer)
+
+
+def annotate_subscriptions(queryset, recipes_limit):
+    recipes = Recipe.objects.all()
+    if recipes_limit:
+        recipes = recipes.filter(id__in=Subquery(
+            Recipe.objects.filter(
+                author=OuterRef('author')
+            ).values('id')[:int(recipes_limit)]
+        ))
+    return queryset.prefetch_related(
+        Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+    )
 
 
-class CustomUserViewSet(ModelViewSet):
+class CustomUserViewSet(UserConditionalMixin, ModelViewSet):
     serializer_class = CustomUserSerializer
     queryset = User.objects.all()
     permission_classes = settings.PERMISSIONS.user
@@ -40,6 +72,17 @@ class CustomUserViewSet(ModelViewSet):
             raise NotFound()
         super().permission_denied(request, **kwargs)
 
+    def get_queryset(self):
+        user = self.request.user
+        if user.is_anonymous:
+            return User.objects.all()
+        return User.objects.annotate(
+            is_subscribed=Exists(Follow.objects.filter(
+                user=user,
+                author=OuterRef('pk'),
+            ))
+        )
+
     def get_permissions(self):
         if self.action == "create":
             self.permission_classes = settings.PERMISSIONS.user_create
@@ -90,113 +133,121 @@ class CustomUserViewSet(ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(ReplicaReadMixin, ReferenceCacheMixin, ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    reference = tag_reference
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(ReplicaReadMixin, ReferenceCacheMixin,
+                        ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = (SearchFilter, )
-    search_fields = ('^name',)
+    reference = ingredient_reference
+    filter_backends = (IngredientSearchFilter, )
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin, RecipeConditionalMixin,
+                    AnonymousResponseCacheMixin, ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
-    pagination_class = CustomPagination
+    pagination_class = CustomCursorPagination
+    filter_backends = (RecipeFilterBackend, )
+
+    @property
+    def cursor_ordering(self):
+        field = SCORE_FIELDS.get(self.request.query_params.get('ordering'))
+        if field is None:
+            return ('-pub_date', 'id')
+        return (f'-{field}', 'id')
+
+    def get_serializer_class(self):
+        if self.action in ('list', 'retrieve', 'feed'):
+            return RecipeGetSerializer
+        return RecipeSerializer
+
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve', 'feed'):
+            recipes = Recipe.objects.select_related('author')
+        else:
+            recipes = Recipe.objects.with_related()
+        return recipes.with_user_flags(self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
-    def list(self, request, *args, **kwargs):
-        queryset = Recipe.objects.all()
-        tags = self.request.query_params.getlist('tags', False)
-        if tags:
-            queryset = queryset.filter(tags__slug__in=tags).distinct()
-        is_in_shopping_cart = self.request.query_params.get(
-            'is_in_shopping_cart',
-            '0'
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+
+    @action(detail=False, permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        paginator = FeedPagination()
+        page = paginator.paginate_sources(
+            feed_sources(request.user),
+            self.get_queryset(),
+            request,
         )
-        if is_in_shopping_cart == '1':
-            queryset = queryset.filter(
-                shoppingcart__user=request.user
-            )
-        is_favorited = self.request.query_params.get('is_favorited', '0')
-        if is_favorited == '1':
-            queryset = queryset.filter(
-                favorited__user=request.user
-            )
-        author_id = self.request.query_params.get('author', False)
-        if author_id:
-            author = get_object_or_404(User, id=int(author_id))
-            queryset = queryset.filter(
-                author=author
-            )
-
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(['POST', 'DELETE', ])
+@transaction.atomic
 def favorited(request, recipe_id):
     recipe = get_object_or_404(Recipe, id=recipe_id)
     user = request.user
+    lock_user(user)
     if request.method == 'DELETE':
         Favorited.objects.filter(
             recipe=recipe,
             user=user
         ).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
-    if Favorited.objects.filter(
-        recipe=recipe,
-        user=user
-    ).exists():
+    try:
+        with transaction.atomic():
+            Favorited.objects.create(
+                recipe=recipe,
+                user=user
+            )
+    except IntegrityError:
         return Response(
             {"errors": "Рецепт уже добавлен в избранное"},
             status=status.HTTP_400_BAD_REQUEST,
         )
-    Favorited.objects.create(
-        recipe=recipe,
-        user=user
-    )
     serializer = RecipeShortSerializer(recipe)
     return Response(data=serializer.data, status=status.HTTP_201_CREATED)
 
 
 @api_view(['POST', 'DELETE', ])
+@transaction.atomic
 def shopping_cart(request, recipe_id):
     recipe = get_object_or_404(Recipe, id=recipe_id)
     user = request.user
+    lock_user(user)
     if request.method == 'DELETE':
         ShoppingCart.objects.filter(
             recipe=recipe,
             user=user
         ).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
-    if ShoppingCart.objects.filter(
-        recipe=recipe,
-        user=user
-    ).exists():
+    try:
+        with transaction.atomic():
+            ShoppingCart.objects.create(
+                recipe=recipe,
+                user=user
+            )
+    except IntegrityError:
         return Response(
             {"errors": "Рецепт уже добавлен в список покупок"},
             status=status.HTTP_400_BAD_REQUEST,
         )
-    ShoppingCart.objects.create(
-        recipe=recipe,
-        user=user
-    )
     serializer = RecipeShortSerializer(recipe)
     return Response(data=serializer.data, status=status.HTTP_201_CREATED)
 
 
 @api_view(['POST', 'DELETE', ])
+@transaction.atomic
 def subscribe(request, user_id):
     author = get_object_or_404(User, id=user_id)
     user = request.user
@@ -205,49 +256,81 @@ def subscribe(request, user_id):
             {"errors": "Нельзя подписываться на себя"},
             status=status.HTTP_400_BAD_REQUEST,
         )
+    lock_user(user)
     if request.method == 'DELETE':
         Follow.objects.filter(
             author=author,
             user=user
         ).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
-    if Follow.objects.filter(
-        author=author,
-        user=user
-    ).exists():
+    try:
+        with transaction.atomic():
+            Follow.objects.create(
+                author=author,
+                user=user
+            )
+    except IntegrityError:
         return Response(
             {"errors": "Вы уже подписаны на данного пользователя"},
             status=status.HTTP_400_BAD_REQUEST,
         )
-    Follow.objects.create(
-        author=author,
-        user=user
-    )
     limit = request.query_params.get('recipes_limit')
+    author = annotate_subscriptions(
+        User.objects.filter(id=author.id),
+        limit,
+    ).get()
     serializer = UserSubscribeSerializer(
         author,
         context={'request': request, 'limit': limit})
     return Response(data=serializer.data, status=status.HTTP_201_CREATED)
 
 
-class GetSubscribeVeiwSet(ListModelMixin, GenericViewSet):
-    queryset = User.objects.all()
-    serializer_class = UserSubscribeSerializer
-    pagination_class = CustomPagination
+@api_view(['POST', 'DELETE', ])
+@transaction.atomic
+def favorited_batch(request):
+    return Response(apply_batch(request, Favorited, 'recipe', Recipe))
 
-    def list(self, request, *args, **kwargs):
-        queryset = User.objects.all()
-        queryset = queryset.filter(
-            id__in=request.user.follower.values('author')
-        )
 
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+@api_view(['POST', 'DELETE', ])
+@transaction.atomic
+def shopping_cart_batch(request):
+    return Response(apply_batch(
+        request,
+        ShoppingCart,
+        'recipe',
+        Recipe,
+        shopping_list_created,
+    ))
 
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+
+@api_view(['POST', 'DELETE', ])
+@transaction.atomic
+def subscribe_batch(request):
+    return Response(apply_batch(
+        request,
+        Follow,
+        'author',
+        User,
+        subscriptions_created,
+    ))
+
+
+class GetSubscribeVeiwSet(SubscriptionConditionalMixin, ListModelMixin,
+                          GenericViewSet):
+    queryset = User.objects.all()
+    serializer_class = UserSubscribeSerializer
+    pagination_class = CustomCursorPagination
+    permission_classes = [IsAuthenticated]
+    cursor_ordering = ('id', )
+
+    def get_queryset(self):
+        queryset = User.objects.filter(
+            id__in=self.request.user.follower.values('author')
+        ).order_by('id')
+        return annotate_subscriptions(
+            queryset,
+            self.request.query_params.get('recipes_limit'),
+        )
 
     def get_serializer_context(self):
         limit = self.request.query_params.get('recipes_limit')
@@ -259,22 +342,48 @@ class GetSubscribeVeiwSet(ListModelMixin, GenericViewSet):
         }
 
 
-@api_view(['GET', ])
-def download_shopping_cart(request):
-    user = request.user
-    if user.is_anonymous:
-        return Response(
-            {'detail': 'Учетные данные не были предоставлены.'},
-            status=status.HTTP_401_UNAUTHORIZED,
+class ExportContentNegotiation(DefaultContentNegotiation):
+    settings = APISettings({
+        **api_settings.user_settings,
+        'URL_FORMAT_OVERRIDE': None,
+    })
+
+
+class DownloadShoppingCartView(APIView):
+    content_negotiation_class = ExportContentNegotiation
+
+    def get(self, request):
+        user = request.user
+        if user.is_anonymous:
+            return Response(
+                {'detail': 'Учетные данные не были предоставлены.'},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+        export_format = request.query_params.get('format', 'pdf')
+        if export_format not in SHOPPING_CART_FORMATS:
+            return Response(
+                {'errors': 'Неподдерживаемый формат списка покупок'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        user.shopping_list_version = User.objects.filter(
+            pk=user.pk
+        ).values_list('shopping_list_version', flat=True).get()
+        etag = quote_etag(shopping_list_key(user, export_format))
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            return response
+        ingredients = ShoppingListItem.objects.filter(
+            user=request.user
+        ).values(
+            'ingredient__name',
+            'ingredient__measurement_unit',
+            amount=F('total_amount'),
+        ).order_by('ingredient__name')
+        response = FileResponse(
+            cached_shopping_list(user, export_format, ingredients.iterator()),
+            as_attachment=True,
+            filename=f'shopping_cart.{export_format}',
         )
-    ingredients = IngredientRecipe.objects.filter(
-        recipe__shoppingcart__user=request.user
-    ).values(
-        'ingredient__name',
-        'ingredient__measurement_unit'
-    ).annotate(amount=Sum('amount'))
-    return FileResponse(
-        create_shopping_cart_pdf(ingredients),
-        as_attachment=True,
-        filename='shopping_cart.pdf',
-    )
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
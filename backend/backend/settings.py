@@ -19,7 +19,7 @@ INSTALLED_APPS = [
     'corsheaders',
     'rest_framework.authtoken',
     'djoser',
-    'api',
+    'api.apps.ApiConfig',
     'colorfield',
 ]
 
@@ -30,8 +30,10 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.routers.PrimaryPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.instrumentation.InstrumentationMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -61,10 +63,51 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
-        'PORT': os.getenv('DB_PORT')
+        'PORT': os.getenv('DB_PORT'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
     }
 }
 
+DB_CONN_HEALTH_CHECKS = os.getenv('DB_CONN_HEALTH_CHECKS', '1') == '1'
+
+DB_REPLICAS = []
+
+for number, host in enumerate(filter(None, os.getenv(
+    'DB_REPLICA_HOSTS', ''
+).split(','))):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DB_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['api.routers.ReplicaRouter']
+
+DB_REPLICA_PIN_SECONDS = 10
+
+DB_REPLICA_PIN_CACHE = os.getenv('DB_REPLICA_PIN_CACHE', 'default')
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'api.cache.DatabaseCache',
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'api_cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 100000)),
+        },
+    },
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'api-local',
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('LOCAL_CACHE_MAX_ENTRIES', 5000)),
+        },
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.'
@@ -100,6 +143,20 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+SHOPPING_LIST_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'shopping_lists')
+SHOPPING_LIST_CACHE_MAX_SIZE = 100 * 1024 * 1024
+
+SHOPPING_LIST_RENDER_WORKERS = int(os.getenv(
+    'SHOPPING_LIST_RENDER_WORKERS',
+    min(2, (os.cpu_count() or 1) - 1),
+))
+
+SHOPPING_LIST_RENDER_QUEUE = 8
+
+SHOPPING_LIST_RENDER_TIMEOUT = 30
+
+SHOPPING_LIST_RENDER_RETRY_AFTER = 5
+
 AUTH_USER_MODEL = 'api.User'
 
 REST_FRAMEWORK = {
@@ -107,7 +164,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
     'SEARCH_PARAM': 'name',
 }
@@ -124,6 +181,89 @@ DJOSER = {
     'LOGIN_FIELD': 'email',
 }
 
+INGREDIENT_SEARCH_LIMIT = 50
+
+BATCH_MAX_SIZE = 100
+
+TOKEN_CACHE = os.getenv('TOKEN_CACHE', 'local')
+
+TOKEN_CACHE_TIMEOUT = 10
+
+TOKEN_CACHE_MAX_SIZE = 10000
+
+RECIPE_SEARCH_CONFIG = 'russian'
+
+RECIPE_SEARCH_LIMIT = 1000
+
+RECIPE_SCORE_FAVORITE_WEIGHT = 1.0
+
+RECIPE_SCORE_SHOPPING_CART_WEIGHT = 0.5
+
+RECIPE_POPULAR_HALF_LIFE_HOURS = 24 * 30
+
+RECIPE_TRENDING_HALF_LIFE_HOURS = 24
+
+RECIPE_SCORE_MIN = 0.01
+
+IMAGE_MAX_SIZE = 10 * 1024 * 1024
+
+IMAGE_MAX_DIMENSION = 6000
+
+IMAGE_THUMBNAIL_SIZE = 480
+
+IMAGE_THUMBNAIL_WORKERS = 2
+
+FEED_MAX_LENGTH = 500
+
+FEED_TRIM_SLACK = 50
+
+FEED_BATCH_SIZE = 500
+
+FEED_FANOUT_INLINE_LIMIT = 100
+
+FEED_FANOUT_WORKERS = 2
+
+FEED_CELEBRITY_FOLLOWERS = 10000
+
+REFERENCE_CACHE = os.getenv('REFERENCE_CACHE', 'default')
+
+REFERENCE_CACHE_CHECK_INTERVAL = 1
+
+RECIPE_RESPONSE_CACHE = os.getenv('RECIPE_RESPONSE_CACHE', 'default')
+
+RECIPE_RESPONSE_CACHE_TIMEOUT = 60
+
+RECIPE_RESPONSE_CACHE_STALE = 300
+
+RECIPE_RESPONSE_CACHE_LOCK_TIMEOUT = 30
+
+RECIPE_RESPONSE_CACHE_METRICS_INTERVAL = 60
+
+RECIPE_FRAGMENT_CACHE = os.getenv('RECIPE_FRAGMENT_CACHE', 'local')
+
+RECIPE_FRAGMENT_CACHE_TIMEOUT = 600
+
+HTTP_CACHE_MAX_AGE = 10
+
+API_INSTRUMENTATION = os.getenv('API_INSTRUMENTATION') == '1'
+
+API_INSTRUMENTATION_N_PLUS_ONE_THRESHOLD = 5
+
+API_QUERY_BUDGET_MODE = os.getenv('API_QUERY_BUDGET_MODE', 'warn')
+
+API_QUERY_BUDGET_DEFAULT = None
+
+API_QUERY_BUDGETS = {
+    'recipes-list': 7,
+    'recipes-detail': 6,
+    'recipes-feed': 8,
+    'tags-list': 2,
+    'ingredients-list': 2,
+    'users-me': 2,
+    'api/users/subscriptions/': 3,
+    'api/recipes/download_shopping_cart/': 3,
+}
+
 CORS_URLS_REGEX = r'^/api/.*$'
 
 CORS_ALLOWED_ORIGINS = [
@@ -0,0 +1,7 @@
+import os
+
+bind = '0:8000'
+worker_class = 'gthread'
+workers = int(os.getenv('GUNICORN_WORKERS', 3))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))